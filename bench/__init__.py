@@ -0,0 +1,2 @@
+# Бенчмарки: python -m bench (см. README). Запускаются из корня проекта —
+# модули приложения импортируются как в main.py
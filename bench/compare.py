@@ -0,0 +1,60 @@
+import argparse
+import json
+import sys
+
+# Допустимое замедление медианы: 0.25 — на 25%
+DEFAULT_THRESHOLD = 0.25
+# Разница меньше этой (мс) — шум таймера, а не регрессия
+MIN_DELTA_MS = 0.05
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    # Строки (размер, случай, было мс, стало мс, отношение) по медианам двух прогонов;
+    # второй список — только регрессии сверх threshold
+    rows = []
+    regressions = []
+    for size, cases in current.get("results", {}).items():
+        old_cases = baseline.get("results", {}).get(size, {})
+        for name, stats in cases.items():
+            old = old_cases.get(name)
+            if old is None:
+                continue
+            before, after = old["median_ms"], stats["median_ms"]
+            ratio = after / before if before else float("inf")
+            row = (size, name, before, after, ratio)
+            rows.append(row)
+            if ratio > 1 + threshold and after - before > min_delta_ms:
+                regressions.append(row)
+    return rows, regressions
+
+
+def report(baseline, current, threshold=DEFAULT_THRESHOLD, out=sys.stdout):
+    # Печатает сравнение; код выхода 1, если есть регрессии
+    rows, regressions = compare(baseline, current, threshold)
+    slow = {(size, name) for size, name, *_ in regressions}
+    for size, name, before, after, ratio in rows:
+        mark = "  РЕГРЕССИЯ" if (size, name) in slow else ""
+        print(f"{size:>5}  {name:<45} {before:>11.3f} → {after:>11.3f} ms  x{ratio:.2f}{mark}", file=out)
+    if regressions:
+        print(f"Регрессий: {len(regressions)} (порог +{threshold:.0%})", file=out)
+        return 1
+    print(f"Регрессий нет (порог +{threshold:.0%})", file=out)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.compare", description="Сравнение двух прогонов бенчмарков")
+    parser.add_argument("baseline", help="JSON прошлого прогона")
+    parser.add_argument("current", help="JSON нового прогона")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление медианы, доля (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    return report(baseline, current, args.threshold)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+import connection
+import database
+
+# Размеры тестовых баз: имя → число задач
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+DEFAULT_SEED = 1
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Даты считаются от фиксированного дня, а не от сегодняшнего: база с тем же seed
+# одинакова в любой день, и сравнение прогонов не зависит от даты запуска
+ANCHOR = date(2025, 6, 1)
+
+# Распределения близки к живой базе: большая часть задач — в ожидании или завершена,
+# дедлайны сгущаются вокруг «сегодня», у части задач дедлайна нет
+STATUS_WEIGHTS = {"pending": 45, "in progress": 20, "completed": 30, "postponed": 5}
+PRIORITY_WEIGHTS = {"high": 20, "medium": 55, "low": 25}
+CATEGORY_WEIGHTS = dict(zip(database.DEFAULT_CATEGORIES, (35, 20, 25, 8, 7)), **{"": 5})
+TAGS = ["срочно", "дом", "звонок", "встреча", "отчёт", "покупки", "идея", "ждёт ответа",
+        "проект-a", "проект-b", "проект-c", "квартал"]
+WORDS = ["подготовить", "отправить", "позвонить", "купить", "проверить", "обсудить", "записаться",
+         "оплатить", "написать", "прочитать", "отчёт", "договор", "презентацию", "врачу", "клиенту",
+         "продукты", "счёт", "план", "письмо", "статью", "бюджет", "встречу", "документы", "маме"]
+RECURRENCES = ["FREQ=DAILY", "FREQ=WEEKLY", "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR",
+               "FREQ=MONTHLY", "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO", "FREQ=YEARLY"]
+
+NO_DEADLINE_SHARE = 0.10
+DEADLINE_SPREAD_DAYS = 60     # стандартное отклонение дедлайна от ANCHOR
+DEADLINE_LIMIT_DAYS = 730
+RECURRING_SHARE = 0.02
+REMINDER_SHARE = 0.05
+TAGGED_SHARE = 0.40
+DESCRIPTION_SHARE = 0.30
+CHUNK_SIZE = 10_000
+
+
+def _weighted(weights):
+    return list(weights), list(weights.values())
+
+
+def generate_tasks(count, seed=DEFAULT_SEED):
+    # Генератор task_data; одинаковые count и seed дают одинаковую последовательность
+    rnd = random.Random(seed)
+    statuses, status_w = _weighted(STATUS_WEIGHTS)
+    priorities, priority_w = _weighted(PRIORITY_WEIGHTS)
+    categories, category_w = _weighted(CATEGORY_WEIGHTS)
+    anchor = datetime(ANCHOR.year, ANCHOR.month, ANCHOR.day)
+    for i in range(count):
+        status = rnd.choices(statuses, status_w)[0]
+        deadline = None
+        if rnd.random() >= NO_DEADLINE_SHARE:
+            offset = int(rnd.gauss(0, DEADLINE_SPREAD_DAYS))
+            if status == "completed":
+                offset = -abs(offset)  # завершённые чаще в прошлом
+            offset = max(-DEADLINE_LIMIT_DAYS, min(DEADLINE_LIMIT_DAYS, offset))
+            deadline = (ANCHOR + timedelta(days=offset)).isoformat()
+        created = anchor - timedelta(days=rnd.randint(0, 400), seconds=rnd.randint(0, 86399))
+        title = " ".join(rnd.sample(WORDS, rnd.randint(2, 4))).capitalize() + f" #{i + 1}"
+        data = {
+            'title': title,
+            'description': " ".join(rnd.choices(WORDS, k=rnd.randint(5, 25)))
+                           if rnd.random() < DESCRIPTION_SHARE else '',
+            'deadline': deadline,
+            'priority': rnd.choices(priorities, priority_w)[0],
+            'category': rnd.choices(categories, category_w)[0],
+            'status': status,
+            'tags': ", ".join(rnd.sample(TAGS, rnd.randint(1, 3))) if rnd.random() < TAGGED_SHARE else '',
+            'recurrence': None,
+            'reminder': None,
+            'created_at': created.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        if deadline and rnd.random() < RECURRING_SHARE:
+            data['recurrence'] = rnd.choice(RECURRENCES)
+        if deadline and status != "completed" and rnd.random() < REMINDER_SHARE:
+            data['reminder'] = f"{deadline} {rnd.randint(7, 21):02d}:{rnd.choice((0, 15, 30, 45)):02d}"
+        yield data
+
+
+def use_database(path, profile=None):
+    # Переключает database на файл path (как exporter --db) и создаёт схему
+    connection.close_all()
+    database.DB_NAME = path
+    database.init_db(profile)
+
+
+def generate(path, count, seed=DEFAULT_SEED, profile=None):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    use_database(path, profile)
+    chunk = []
+    for data in generate_tasks(count, seed):
+        chunk.append(data)
+        if len(chunk) >= CHUNK_SIZE:
+            database.add_tasks(chunk)
+            chunk = []
+    database.add_tasks(chunk)
+    conn = database.get_connection()
+    conn.execute("ANALYZE")
+    # весь WAL — в основной файл: готовую базу можно копировать одним файлом
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    connection.close_all()
+    return path
+
+
+def database_path(size, seed=DEFAULT_SEED, data_dir=DATA_DIR):
+    # В имени — версия схемы: после новой миграции база создаётся заново
+    return os.path.join(data_dir, f"planner-{size}-s{seed}-v{len(database.MIGRATIONS)}.db")
+
+
+def ensure_database(size, seed=DEFAULT_SEED, data_dir=DATA_DIR, profile=None):
+    # Путь к готовой базе размера size; создаётся при первом обращении
+    path = database_path(size, seed, data_dir)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Создаётся {os.path.basename(path)} ({SIZES[size]} задач)…", file=sys.stderr)
+        generate(path + ".tmp", SIZES[size], seed, profile)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.generate", description="Синтетическая planner.db для бенчмарков")
+    parser.add_argument("output", help="файл базы")
+    parser.add_argument("--size", choices=sorted(SIZES), default="1k")
+    parser.add_argument("--count", type=int, help="число задач (вместо --size)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+    count = args.count if args.count is not None else SIZES[args.size]
+    generate(args.output, count, args.seed)
+    print(f"Создано задач: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
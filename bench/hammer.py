@@ -0,0 +1,148 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import connection
+import database
+from bench.generate import DEFAULT_SEED, ensure_database, generate_tasks
+
+# Несколько процессов одновременно пишут и читают один planner.db — как два окна
+# программы при автозапуске и экспорт из консоли. Проверка профиля хранения:
+# код выхода 1, если хоть один процесс получил «database is locked»;
+# время ожидания блокировки видно по задержкам. Тест — tests/test_concurrency.py
+DEFAULT_PROCESSES = 6
+DEFAULT_ROUNDS = 200
+LOCKED = "database is locked"
+
+
+def _use_database(path, profile=None):
+    connection.close_all()
+    database.DB_NAME = path
+    database.init_db(profile)
+
+
+def _task(n, i):
+    return {
+        'title': f"Отчёт {n}-{i}",
+        'description': "план на неделю",
+        'deadline': f"2030-01-{i % 28 + 1:02d}",
+        'priority': ("low", "medium", "high")[i % 3],
+        'category': "Работа",
+        'status': "pending",
+        'tags': "срочно" if i % 2 else "",
+    }
+
+
+def simple_tasks(n, count):
+    # Задачи процесса n без генератора тестовых баз
+    return [_task(n, i) for i in range(count)]
+
+
+def generated_tasks(seed=DEFAULT_SEED):
+    return lambda n, count: list(generate_tasks(count, seed + n))
+
+
+def _worker(path, profile, tasks, start, queue):
+    locked = []
+    errors = []
+    slowest = 0.0
+    began = time.perf_counter()
+
+    def note(where, e):
+        (locked if LOCKED in str(e) else errors).append(f"{where}: {e}")
+
+    try:
+        # ошибка при открытии тоже попадает в результат — иначе родитель ждал бы его вечно
+        _use_database(path, profile)
+        start.wait()
+        began = time.perf_counter()
+        for i, data in enumerate(tasks):
+            step = time.perf_counter()
+            try:
+                task_id = database.add_task(data)
+                database.query_tasks(keyword="отчёт", order='rank', limit=20)
+                database.count_tasks(status="pending")
+                database.update_task_status(task_id, "completed")
+            except sqlite3.Error as e:
+                note(f"раунд {i}", e)
+            slowest = max(slowest, time.perf_counter() - step)
+    except Exception as e:
+        note("подключение", e)
+    finally:
+        connection.close_all()
+        queue.put({"pid": os.getpid(), "rounds": len(tasks), "seconds": round(time.perf_counter() - began, 3),
+                   "slowest_round_ms": round(slowest * 1000, 2), "locked": locked, "errors": errors})
+
+
+def hammer(path, processes=DEFAULT_PROCESSES, rounds=DEFAULT_ROUNDS, profile=None, tasks_for=simple_tasks):
+    # tasks_for(n, rounds) — задачи процесса n. Схема создаётся здесь, если базы ещё нет
+    _use_database(path, profile)
+    connection.close_all()     # соединение родителя процессам не мешает
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    start = ctx.Event()
+    workers = [ctx.Process(target=_worker, args=(path, profile, tasks_for(n, rounds), start, queue))
+               for n in range(processes)]
+    for p in workers:
+        p.start()
+    start.set()
+    results = [queue.get() for _ in workers]
+    for p in workers:
+        p.join()
+    return {
+        "profile": profile or connection.DEFAULT_PROFILE,
+        "processes": processes,
+        "rounds": rounds,
+        "locked": sum(len(r["locked"]) for r in results),
+        "errors": sum(len(r["errors"]) for r in results),
+        "workers": results,
+    }
+
+
+def print_result(result):
+    for r in result["workers"]:
+        print(f"pid {r['pid']}: {r['rounds']} раундов за {r['seconds']} с, худший раунд "
+              f"{r['slowest_round_ms']} мс, блокировок {len(r['locked'])}, других ошибок {len(r['errors'])}")
+        for error in (r["locked"] + r["errors"])[:5]:
+            print("    " + error)
+    ok = not result["locked"] and not result["errors"]
+    print(f"{'OK' if ok else 'ОШИБКА'}: профиль {result['profile']}, {result['processes']} процессов "
+          f"по {result['rounds']} раундов, «{LOCKED}» — {result['locked']}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench.hammer", description="Конкурентный доступ нескольких процессов к planner.db")
+    parser.add_argument("--size", default="1k",
+                        help="размер исходной базы (см. bench.generate.SIZES); empty — пустая база")
+    parser.add_argument("--processes", type=int, default=DEFAULT_PROCESSES)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--storage", choices=sorted(connection.STORAGE_PROFILES), help="профиль хранения SQLite")
+    parser.add_argument("--output", help="файл JSON с результатами")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="planner-hammer-")
+    path = os.path.join(workdir, "planner.db")
+    try:
+        if args.size == "empty":
+            result = hammer(path, args.processes, args.rounds, args.storage)
+        else:
+            shutil.copyfile(ensure_database(args.size), path)
+            result = hammer(path, args.processes, args.rounds, args.storage, generated_tasks())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    ok = print_result(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
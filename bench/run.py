@@ -0,0 +1,344 @@
+import argparse
+import calendar
+import collections
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import connection
+import database
+import importer
+from bench import compare
+from bench.generate import ANCHOR, DEFAULT_SEED, SIZES, ensure_database, generate_tasks, use_database
+from store import TaskStore
+from ui import TaskPlannerApp, month_tasks_by_date
+from virtual_tree import PAGE_SIZE, ListSource
+
+DEFAULT_SIZES = ("1k", "100k")
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_REPEAT = 7
+MIN_RUNS = 3
+# Сколько секунд можно тратить на один случай сверх MIN_RUNS прогонов
+CASE_BUDGET_S = 3.0
+# Быстрые вызовы повторяются в цикле, пока один замер не займёт хотя бы столько
+MIN_SAMPLE_S = 0.005
+MAX_NUMBER = 1000
+BATCH_SIZE = 1000      # задач в пакетных операциях (add_tasks, смена статуса, удаление, вставка)
+KEYWORD = "отчёт план"
+NARROW_FROM = "отч"     # прошлый запрос, который KEYWORD дописывает
+TAGS = "срочно, дом"
+
+
+def measure(fn, setup=None, repeat=DEFAULT_REPEAT, budget=CASE_BUDGET_S):
+    # Время одного вызова fn, мс. setup() готовит аргументы и в замер не входит;
+    # без setup быстрый fn вызывается number раз подряд и время делится
+    number = 1
+    if setup is None:
+        start = time.perf_counter()
+        fn()
+        first = time.perf_counter() - start
+        if first < MIN_SAMPLE_S:
+            number = min(MAX_NUMBER, max(1, int(MIN_SAMPLE_S / max(first, 1e-7))))
+    samples = []
+    spent = 0.0
+    while len(samples) < repeat and (len(samples) < MIN_RUNS or spent < budget):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        elapsed = time.perf_counter() - start
+        spent += elapsed
+        samples.append(elapsed / number * 1000)
+    return {
+        "runs": len(samples),
+        "number": number,
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "max_ms": round(max(samples), 4),
+    }
+
+
+def _consume(iterator):
+    collections.deque(iterator, maxlen=0)
+
+
+class Context:
+    # Данные, на которых гоняются случаи: выборки id, месяц календаря, хранилище
+    def __init__(self, seed):
+        rnd = random.Random(seed)
+        total = database.count_tasks()
+        self.total = total
+        self.sample_ids = sorted(rnd.sample(range(1, total + 1), min(BATCH_SIZE, total)))
+        self.one_id = self.sample_ids[len(self.sample_ids) // 2]
+        self.year, self.month = ANCHOR.year, ANCHOR.month
+        self.month_start = f"{self.year:04d}-{self.month:02d}-01"
+        self.month_end = f"{self.year:04d}-{self.month:02d}-{calendar.monthrange(self.year, self.month)[1]:02d}"
+        self.category = database.DEFAULT_CATEGORIES[0]
+        self.new_tasks = list(generate_tasks(BATCH_SIZE, seed + 1))
+        self.scratch_ids = []
+        self.store = None
+        self.counter = 0
+
+    def next(self):
+        self.counter += 1
+        return self.counter
+
+    def paste_text(self):
+        # Таблица, как её копирует Excel: заголовок и строки через табуляцию
+        fields = ("title", "category", "priority", "status", "deadline", "tags")
+        lines = ["\t".join(fields)]
+        for data in self.new_tasks:
+            lines.append("\t".join(str(data[f] or "") for f in fields))
+        return "\n".join(lines) + "\n"
+
+
+# ====== Случаи ======
+def database_read_cases(ctx):
+    ids, one = ctx.sample_ids, ctx.one_id
+    yield "database.get_db_path", database.get_db_path, None
+    yield "database.get_connection", database.get_connection, None
+
+    def empty_transaction():
+        with database.transaction():
+            pass
+    yield "database.transaction", empty_transaction, None
+    yield "database.init_db", database.init_db, None
+    yield "database.get_schema_version", database.get_schema_version, None
+    yield "database.migrate", database.migrate, None
+    yield "database.get_task", lambda: database.get_task(one), None
+    yield "database.get_tasks", lambda: database.get_tasks(ids), None
+    yield "database.get_all_tasks", database.get_all_tasks, None
+    yield "database.get_all_tasks_ordered", database.get_all_tasks_ordered, None
+    yield "database.get_tasks_by_category", lambda: database.get_tasks_by_category(ctx.category), None
+    yield "database.get_tasks_by_status", lambda: database.get_tasks_by_status("in progress"), None
+    yield ("database.get_tasks_by_deadline",
+           lambda: database.get_tasks_by_deadline(ctx.month_start, ctx.month_end), None)
+    yield ("database.get_tasks_in_range",
+           lambda: database.get_tasks_in_range(ctx.month_start, ctx.month_end), None)
+    yield "database.has_fts", database.has_fts, None
+    yield "database.fts_query", lambda: database.fts_query(KEYWORD), None
+    yield "database.query_tasks[page]", lambda: database.query_tasks(limit=PAGE_SIZE), None
+    yield "database.query_tasks[status]", lambda: database.query_tasks(status="in progress"), None
+    yield "database.query_tasks[category]", lambda: database.query_tasks(category=ctx.category), None
+    yield "database.query_tasks[keyword]", lambda: database.query_tasks(keyword=KEYWORD, order='rank'), None
+    yield "database.query_tasks[tags-all]", lambda: database.query_tasks(tags=TAGS), None
+    yield "database.query_tasks[tags-any]", lambda: database.query_tasks(tags=TAGS, tags_mode='any'), None
+    yield ("database.query_tasks[deadline]",
+           lambda: database.query_tasks(deadline_range=(ctx.month_start, ctx.month_end), order='deadline'), None)
+    yield ("database.query_tasks[combined-page]",
+           lambda: database.query_tasks(status="pending", category=ctx.category, keyword=KEYWORD,
+                                        order='rank', limit=PAGE_SIZE), None)
+    yield "database.iter_tasks[status]", lambda: _consume(database.iter_tasks(status="pending")), None
+    yield "database.search_task_ids", lambda: database.search_task_ids(KEYWORD), None
+    yield "database.search_tasks", lambda: database.search_tasks(KEYWORD), None
+    yield "database.count_tasks[all]", database.count_tasks, None
+    yield "database.count_tasks[keyword]", lambda: database.count_tasks(keyword=KEYWORD), None
+    yield "database.task_ids_with_tags[all]", lambda: database.task_ids_with_tags(TAGS), None
+    yield "database.task_ids_with_tags[any]", lambda: database.task_ids_with_tags(TAGS, 'any'), None
+    yield "database.get_tags", database.get_tags, None
+    yield ("database.get_upcoming_reminders",
+           lambda: database.get_upcoming_reminders(f"{ctx.month_start} 00:00"), None)
+    yield "database.get_occurrence_overrides", database.get_occurrence_overrides, None
+    yield "database.get_settings", database.get_settings, None
+    yield "database.data_version", database.data_version, None
+    yield "database.get_categories", database.get_categories, None
+
+
+def database_write_cases(ctx):
+    # Записи трогают только задачи, добавленные самим бенчмарком: исходные данные
+    # для остальных случаев не меняются
+    ctx.scratch_ids = database.add_tasks(ctx.new_tasks)
+    scratch = ctx.scratch_ids
+    statuses = ("in progress", "pending")
+    yield "database.add_task", lambda: database.add_task(ctx.new_tasks[0]), None
+    yield "database.add_tasks", lambda: database.add_tasks(ctx.new_tasks), None
+    yield ("database.update_task_status",
+           lambda: database.update_task_status(scratch[0], statuses[ctx.next() % 2]), None)
+    yield ("database.update_statuses",
+           lambda: database.update_statuses(scratch, statuses[ctx.next() % 2]), None)
+    yield ("database.update_reminders",
+           lambda: database.update_reminders(scratch, f"{ANCHOR.isoformat()} {ctx.next() % 24:02d}:00"), None)
+    yield ("database.update_tags",
+           lambda: database.update_tags(scratch[:100], f"bench, срочно, n{ctx.next() % 10}"), None)
+    yield ("database.set_occurrence_status",
+           lambda: database.set_occurrence_status(scratch[0], ctx.month_start, statuses[ctx.next() % 2]), None)
+    yield ("database.delete_task", database.delete_task,
+           lambda: (database.add_task(ctx.new_tasks[0]),))
+    yield ("database.delete_tasks", database.delete_tasks,
+           lambda: (database.add_tasks(ctx.new_tasks),))
+    yield "database.save_settings", lambda: database.save_settings({"bench_counter": ctx.next()}), None
+    yield ("database.add_category", database.add_category,
+           lambda: (database.remove_category("bench") or "bench",))
+    yield ("database.remove_category", database.remove_category,
+           lambda: (database.add_category("bench") or "bench",))
+
+
+def view_cases(ctx):
+    # Подготовка данных для календаря и списка — то, что _render_month и
+    # refresh_task_list делают до виджетов
+    def load():
+        store = TaskStore()
+        store.load()
+        ctx.store = store
+    yield "store.load", load, None
+    store = ctx.store
+
+    def show(rows):
+        source = ListSource(rows)
+        return [TaskPlannerApp._task_row_values(t) for t in source.page(0, PAGE_SIZE)]
+
+    def cold():
+        store._sorted.clear()
+        return ()
+
+    yield "ui.render_month", lambda: month_tasks_by_date(store, ctx.year, ctx.month), None
+    yield "ui.refresh_task_list[cold]", lambda: show(store.query(order='priority')), cold
+    yield "ui.refresh_task_list[warm]", lambda: show(store.query(order='priority')), None
+    yield ("ui.refresh_task_list[status+category]",
+           lambda: show(store.query(status="pending", category=ctx.category)), None)
+    yield "ui.refresh_task_list[tags]", lambda: show(store.query(tags=TAGS)), None
+    yield ("ui.refresh_task_list[search]",
+           lambda: show(store.query(keyword=KEYWORD, order='rank',
+                                    matches=database.search_task_ids(KEYWORD))), None)
+    prefix_ids = database.search_task_ids(NARROW_FROM)
+    yield ("ui.refresh_task_list[narrow]",
+           lambda: show(store.query(keyword=KEYWORD, order='rank', matches=store.narrow(prefix_ids, KEYWORD, NARROW_FROM))),
+           None)
+    yield "ui.sort_tree_by_column[title]", lambda: show(store.query(order='title')), cold
+
+
+def flow_cases(ctx):
+    # Пакетные действия в том виде, как их выполняет интерфейс: запись через хранилище,
+    # затем перерисовка месяца и списка подписчиками
+    store = ctx.store
+
+    def redraw(kind, tasks):
+        month_tasks_by_date(store, ctx.year, ctx.month)
+        store.query(order='priority')[:PAGE_SIZE]
+    ids = [t.id for t in store.add_tasks(ctx.new_tasks)]
+    store.subscribe(redraw)
+    statuses = ("completed", "pending")
+    yield "flow.bulk_status", lambda: store.update_statuses(ids, statuses[ctx.next() % 2]), None
+    yield ("flow.bulk_delete", store.delete_tasks,
+           lambda: ([t.id for t in store.add_tasks(ctx.new_tasks)],))
+    text = ctx.paste_text()
+
+    def paste():
+        # как _run_import: вставка пачками, в хранилище — одним пакетом в конце
+        added = []
+
+        def add_tasks(chunk):
+            tasks = TaskStore.insert(chunk)
+            added.extend(tasks)
+            return tasks
+        _consume(importer.import_tasks(importer.read_text(text), add_tasks=add_tasks))
+        store.apply_added(added)
+    yield "flow.paste", paste, None
+    store.unsubscribe(redraw)
+
+
+SUITES = (database_read_cases, view_cases, database_write_cases, flow_cases)
+
+
+# ====== Прогон ======
+def _covered(results):
+    names = {name.split("[")[0].split(".", 1)[1] for name in results if name.startswith("database.")}
+    public = {name for name, fn in vars(database).items()
+              if inspect.isfunction(fn) and fn.__module__ == "database" and not name.startswith("_")}
+    return sorted(public - names)
+
+
+def run_size(size, seed=DEFAULT_SEED, repeat=DEFAULT_REPEAT, profile=None, log=sys.stderr):
+    # Прогон на копии готовой базы: записи бенчмарка не портят кэш баз
+    source = ensure_database(size, seed, profile=profile)
+    workdir = tempfile.mkdtemp(prefix="planner-bench-")
+    path = os.path.join(workdir, "planner.db")
+    shutil.copyfile(source, path)
+    results = {}
+    try:
+        use_database(path, profile)
+        ctx = Context(seed)
+        for suite in SUITES:
+            for name, fn, setup in suite(ctx):
+                results[name] = stats = measure(fn, setup, repeat)
+                print(f"{size:>5}  {name:<45} {stats['median_ms']:>11.3f} ms", file=log)
+    finally:
+        connection.close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(sizes=DEFAULT_SIZES, seed=DEFAULT_SEED, repeat=DEFAULT_REPEAT, profile=None):
+    if profile is not None:
+        connection.configure(profile)
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "profile": profile or connection.DEFAULT_PROFILE,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": {},
+    }
+    for size in sizes:
+        report["results"][size] = run_size(size, seed, repeat, profile)
+    uncovered = _covered(next(iter(report["results"].values()), {}))
+    if uncovered:
+        print("Без бенчмарка: " + ", ".join(uncovered), file=sys.stderr)
+    report["meta"]["uncovered"] = uncovered
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="bench", description="Бенчмарки TaskPlanner")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                        help=f"размеры баз через запятую: {', '.join(SIZES)}")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="замеров на случай (не больше)")
+    parser.add_argument("--storage", choices=sorted(connection.STORAGE_PROFILES), help="профиль хранения SQLite")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="файл JSON с результатами")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=compare.DEFAULT_THRESHOLD,
+                        help="допустимое замедление медианы, доля (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error("неизвестные размеры: " + ", ".join(unknown))
+
+    report = run(sizes, args.seed, args.repeat, args.storage)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return compare.report(baseline, report, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Размер кэша подготовленных выражений на одно соединение
+STATEMENT_CACHE_SIZE = 256
+
+# Профили хранения: PRAGMA для каждого нового соединения и обслуживание по числу коммитов.
+# WAL позволяет читать, пока другой процесс (второй экземпляр при автозапуске) пишет;
+# на сетевых и синхронизируемых дисках общая память WAL не работает — там "compat"
+STORAGE_PROFILES = {
+    "default": {
+        "journal_mode": "wal",
+        "synchronous": "normal",     # в WAL не теряет целостность, только последние коммиты при сбое питания
+        "busy_timeout": 5000,        # мс ожидания чужой блокировки вместо "database is locked"
+        "cache_size": -16000,        # КиБ (отрицательное значение) — 16 МБ
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "memory",
+        "wal_autocheckpoint": 1000,  # страниц
+        "checkpoint_every": 500,     # коммитов между PRAGMA wal_checkpoint(PASSIVE)
+        "optimize_every": 5000,      # коммитов между PRAGMA optimize
+    },
+    "safe": {
+        "journal_mode": "wal",
+        "synchronous": "full",
+        "busy_timeout": 10000,
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "default",
+        "wal_autocheckpoint": 1000,
+        "checkpoint_every": 200,
+        "optimize_every": 5000,
+    },
+    "compat": {
+        "journal_mode": "delete",
+        "synchronous": "full",
+        "busy_timeout": 15000,
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "default",
+        "wal_autocheckpoint": 0,
+        "checkpoint_every": 0,
+        "optimize_every": 5000,
+    },
+}
+# Профиль можно задать переменной окружения, не меняя кода (например, для папки в облаке)
+DEFAULT_PROFILE = os.environ.get("PLANNER_STORAGE_PROFILE", "default")
+
+# Класс новых соединений. diagnostics.install() подменяет его на TracedConnection,
+# только если замеры включены: иначе лишний вызов Python на каждый execute ни к чему
+connection_factory = sqlite3.Connection
+
+_profile = STORAGE_PROFILES.get(DEFAULT_PROFILE, STORAGE_PROFILES["default"])
+_local = threading.local()
+_lock = threading.Lock()
+_opened = []
+_generation = 0
+
+
+def _casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+def configure(profile):
+    # Имя из STORAGE_PROFILES или словарь с изменёнными ключами поверх "default".
+    # Действует на соединения, открытые после вызова
+    global _profile
+    if isinstance(profile, str):
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"неизвестный профиль хранения: {profile}")
+        _profile = STORAGE_PROFILES[profile]
+    else:
+        _profile = {**STORAGE_PROFILES["default"], **profile}
+
+
+def current_profile():
+    return dict(_profile)
+
+
+def _apply_profile(conn, profile):
+    conn.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+    conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+    if profile['journal_mode'] == "wal":
+        conn.execute(f"PRAGMA wal_autocheckpoint = {int(profile['wal_autocheckpoint'])}")
+
+
+def _open(path):
+    # isolation_level=None — транзакциями управляем сами через transaction()
+    profile = _profile
+    conn = sqlite3.connect(path, isolation_level=None,
+                           timeout=profile['busy_timeout'] / 1000,
+                           cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False,
+                           factory=connection_factory)
+    _apply_profile(conn, profile)
+    # lower()/LIKE в SQLite не понимают регистр кириллицы
+    conn.create_function("casefold", 1, _casefold, deterministic=True)
+    with _lock:
+        _opened.append(conn)
+    return conn
+
+
+def get_connection(path):
+    # Одно долгоживущее соединение на поток и файл БД
+    if getattr(_local, "generation", None) != _generation:
+        # после close_all() соединения потока уже закрыты
+        _local.generation = _generation
+        _local.conns = {}
+        _local.depth = {}
+        _local.commits = {}
+    conn = _local.conns.get(path)
+    if conn is None:
+        conn = _local.conns[path] = _open(path)
+        _local.depth[path] = 0
+        _local.commits[path] = 0
+    return conn
+
+
+@contextmanager
+def transaction(path):
+    # Вложенные вызовы превращаются в SAVEPOINT, коммит — только на внешнем уровне
+    conn = get_connection(path)
+    depth = _local.depth[path]
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE")
+    else:
+        conn.execute(f"SAVEPOINT sp_{depth}")
+    _local.depth[path] = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth[path] = depth
+        # после некоторых ошибок (SQLITE_FULL, IOERR) SQLite уже откатил транзакцию сам —
+        # второй ROLLBACK упал бы и спрятал исходное исключение
+        if conn.in_transaction:
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO sp_{depth}")
+                conn.execute(f"RELEASE sp_{depth}")
+        raise
+    _local.depth[path] = depth
+    if depth == 0:
+        try:
+            conn.execute("COMMIT")
+        except BaseException:
+            # COMMIT не прошёл (например, SQLITE_BUSY в режиме журнала "compat", пока другой
+            # процесс читает): без отката соединение осталось бы в открытой транзакции
+            # с блокировкой RESERVED, и все следующие transaction() в потоке падали бы
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        _after_commit(conn, path)
+    else:
+        conn.execute(f"RELEASE sp_{depth}")
+
+
+def _after_commit(conn, path):
+    # Обслуживание вне транзакции: контрольная точка не даёт WAL-файлу расти, пока
+    # второй экземпляр держит чтение; optimize обновляет статистику планировщика
+    commits = _local.commits[path] = _local.commits[path] + 1
+    every = _profile['checkpoint_every']
+    if every and commits % every == 0:
+        try:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        except sqlite3.OperationalError:
+            pass
+    every = _profile['optimize_every']
+    if every and commits % every == 0:
+        try:
+            conn.execute("PRAGMA optimize")
+        except sqlite3.OperationalError:
+            pass
+
+
+def close_connection(path):
+    conn = getattr(_local, "conns", {}).pop(path, None)
+    if conn is not None:
+        with _lock:
+            if conn in _opened:
+                _opened.remove(conn)
+        conn.close()
+
+
+def close_all():
+    global _generation
+    with _lock:
+        conns = list(_opened)
+        _opened.clear()
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+atexit.register(close_all)
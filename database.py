@@ -1,48 +1,234 @@
-import sqlite3
+import json
 import os
+import sqlite3
 import sys
 
+import connection
+from models import split_tags, task_row_factory
+
 DB_NAME = 'planner.db'
+# Файл настроек прежних версий; импортируется в БД один раз миграцией 3
+LEGACY_SETTINGS_FILE = 'settings.json'
+DEFAULT_CATEGORIES = ["Работа", "Учеба", "Личное", "Здоровье", "Финансы"]
+
+# Порядок приоритетов high → medium → low; то же выражение лежит в индексе idx_tasks_priority_created
+PRIORITY_ORDER = "CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 END"
 
 def get_db_path():
     if getattr(sys, 'frozen', False):
         return os.path.join(os.path.dirname(sys.executable), DB_NAME)
     return DB_NAME
 
-def init_db():
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            deadline DATE,
-            priority TEXT CHECK(priority IN ('low','medium','high')) DEFAULT 'medium',
-            category TEXT,
-            status TEXT CHECK(status IN ('pending','in progress','completed','postponed')) DEFAULT 'pending',
-            tags TEXT,
-            recurrence TEXT,
-            reminder DATETIME
-        )
+def get_connection():
+    return connection.get_connection(get_db_path())
+
+def transaction():
+    # Все записи внутри блока — одна транзакция и один commit
+    return connection.transaction(get_db_path())
+
+def _fetch_tasks(query, params=()):
+    # Запросы вида SELECT * / tasks.* возвращают записи Task, а не кортежи
+    cursor = get_connection().cursor()
+    cursor.row_factory = task_row_factory
+    return cursor.execute(query, params).fetchall()
+
+def init_db(profile=None):
+    # profile — профиль хранения connection.STORAGE_PROFILES (имя или словарь PRAGMA);
+    # задаётся до первого соединения, т.к. PRAGMA применяются при открытии
+    if profile is not None:
+        connection.configure(profile)
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                deadline DATE,
+                priority TEXT CHECK(priority IN ('low','medium','high')) DEFAULT 'medium',
+                category TEXT,
+                status TEXT CHECK(status IN ('pending','in progress','completed','postponed')) DEFAULT 'pending',
+                tags TEXT,
+                recurrence TEXT,
+                reminder DATETIME
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+    migrate()
+    has_fts()  # кэшируем в том же потоке, что и init_db
+
+def _migration_1_indexes(conn):
+    # Индексы под формы запросов: фильтр + ORDER BY created_at DESC, окно дедлайнов
+    # и сортировка «приоритет, затем дата создания» из get_all_tasks_ordered
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_deadline")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_category_created ON tasks(category, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_deadline_created ON tasks(deadline, created_at DESC)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tasks_priority_created ON tasks(({PRIORITY_ORDER}), created_at DESC)")
+
+def _migration_2_fts(conn):
+    # Полнотекстовый индекс по задачам; синхронизируется триггерами.
+    # Если SQLite собран без FTS5 — поиск остаётся на instr() (см. has_fts)
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                title, description, category, tags,
+                content='tasks', content_rowid='id',
+                prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts(rowid, title, description, category, tags)
+            VALUES (new.id, new.title, new.description, new.category, new.tags);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description, category, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.category, old.tags);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description, category, tags ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description, category, tags)
+            VALUES ('delete', old.id, old.title, old.description, old.category, old.tags);
+            INSERT INTO tasks_fts(rowid, title, description, category, tags)
+            VALUES (new.id, new.title, new.description, new.category, new.tags);
+        END
     ''')
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
+    conn.execute("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
+
+def _legacy_settings_paths():
+    # settings.json искался относительно текущего каталога; смотрим и рядом с БД
+    paths = [os.path.join(os.path.dirname(os.path.abspath(get_db_path())), LEGACY_SETTINGS_FILE),
+             os.path.abspath(LEGACY_SETTINGS_FILE)]
+    return list(dict.fromkeys(paths))
+
+def _migration_3_settings(conn):
+    # Категории — отдельная таблица (tasks.category ссылается на categories.name),
+    # настройки — в таблице settings как JSON-значения. settings.json не удаляется
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
         )
     ''')
-    conn.commit()
-    conn.close()
+    # Категория новой или изменённой задачи сразу попадает в список
+    for event, columns in (("insert", ""), ("update", " OF category")):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tasks_category_{event} AFTER {event.upper()}{columns} ON tasks
+            WHEN new.category IS NOT NULL AND new.category <> '' BEGIN
+                INSERT OR IGNORE INTO categories(name) VALUES (new.category);
+            END
+        ''')
+    legacy = None
+    for path in _legacy_settings_paths():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            break
+        except (OSError, ValueError):
+            continue
+    if not isinstance(legacy, dict):
+        legacy = {}
+    categories = legacy.pop("categories", None)
+    if not isinstance(categories, list):
+        categories = DEFAULT_CATEGORIES
+    conn.executemany("INSERT OR IGNORE INTO categories(name) VALUES (?)",
+                     [(name.strip(),) for name in categories if isinstance(name, str) and name.strip()])
+    conn.execute("INSERT OR IGNORE INTO categories(name) "
+                 "SELECT DISTINCT category FROM tasks WHERE category IS NOT NULL AND category <> ''")
+    conn.executemany("INSERT OR IGNORE INTO settings(key, value) VALUES (?, ?)",
+                     [(key, json.dumps(value, ensure_ascii=False)) for key, value in legacy.items()])
 
-def add_task(task_data):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO tasks (title, description, deadline, priority, category, status, tags, recurrence, reminder)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+def _migration_4_occurrences(conn):
+    # Статус отдельного повторения повторяющейся задачи (см. recurrence.py).
+    # Сами повторения не хранятся — только дни, где статус отличается от задачи
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_occurrences (
+            task_id INTEGER NOT NULL,
+            occurrence_date DATE NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('pending','in progress','completed','postponed')),
+            PRIMARY KEY (task_id, occurrence_date)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_occurrences_ad AFTER DELETE ON tasks BEGIN
+            DELETE FROM task_occurrences WHERE task_id = old.id;
+        END
+    ''')
+
+def _migration_5_reminders(conn):
+    # Частичный индекс под выборку ближайших напоминаний (get_upcoming_reminders):
+    # в нём только задачи с напоминанием, завершённые не попадают
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_reminder ON tasks(reminder) "
+                 "WHERE reminder IS NOT NULL AND status <> 'completed'")
+
+def _migration_6_tags(conn):
+    # Нормализованные теги: одна строка на пару (тег, задача). Первичный ключ (tag, task_id)
+    # даёт выборку задач по тегу поиском по индексу вместо LIKE по tasks.tags,
+    # idx_task_tags_task — замену и удаление тегов задачи.
+    # Теги разбираются в Python (split_tags): в триггерах SQLite нет WITH,
+    # а lower() не знает кириллицы. Поэтому вставку и замену ведут add_task(s)
+    # и update_tags, удаление — триггер
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_tags (
+            tag TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            PRIMARY KEY (tag, task_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_task_tags_task ON task_tags(task_id)")
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_tags_ad AFTER DELETE ON tasks BEGIN
+            DELETE FROM task_tags WHERE task_id = old.id;
+        END
+    ''')
+    rows = conn.execute("SELECT id, tags FROM tasks WHERE tags IS NOT NULL AND tags <> ''").fetchall()
+    conn.executemany(_INSERT_TAG, (row for task_id, tags in rows for row in _tag_rows(task_id, tags)))
+
+# Версия схемы = PRAGMA user_version = число применённых миграций.
+# Новые миграции только добавляются в конец списка.
+MIGRATIONS = [
+    _migration_1_indexes,
+    _migration_2_fts,
+    _migration_3_settings,
+    _migration_4_occurrences,
+    _migration_5_reminders,
+    _migration_6_tags,
+]
+
+def get_schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    # Обновляет существующий planner.db на месте, каждая миграция — своя транзакция
+    while get_schema_version() < len(MIGRATIONS):
+        with transaction() as conn:
+            # версию перечитываем под блокировкой: второй экземпляр мог успеть раньше
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < len(MIGRATIONS):
+                MIGRATIONS[version](conn)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+    _fts_available.pop(get_db_path(), None)
+
+_INSERT_TASK = '''
+    INSERT INTO tasks (title, description, deadline, priority, category, status, tags, recurrence, reminder, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+'''
+
+def _task_params(task_data):
+    return (
         task_data['title'],
         task_data.get('description', ''),
         task_data.get('deadline'),
@@ -51,56 +237,72 @@ def add_task(task_data):
         task_data.get('status', 'pending'),
         task_data.get('tags', ''),
         task_data.get('recurrence'),
-        task_data.get('reminder')
-    ))
-    conn.commit()
-    conn.close()
+        task_data.get('reminder'),
+        task_data.get('created_at')
+    )
+
+_INSERT_TAG = "INSERT OR IGNORE INTO task_tags(tag, task_id) VALUES (?, ?)"
+
+def _tag_rows(task_id, tags):
+    return [(tag, task_id) for tag in split_tags(tags)]
+
+def _last_task_id(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+    return row[0] if row else 0
+
+def add_task(task_data):
+    with transaction() as conn:
+        task_id = conn.execute(_INSERT_TASK, _task_params(task_data)).lastrowid
+        conn.executemany(_INSERT_TAG, _tag_rows(task_id, task_data.get('tags')))
+        return task_id
+
+def add_tasks(tasks_data):
+    # Одна транзакция на весь пакет: ошибка в любой строке откатывает всё
+    rows = [_task_params(t) for t in tasks_data]
+    if not rows:
+        return []
+    with transaction() as conn:
+        first_id = _last_task_id(conn) + 1
+        conn.executemany(_INSERT_TASK, rows)
+        last_id = _last_task_id(conn)
+        # AUTOINCREMENT внутри одной транзакции выдаёт id подряд
+        ids = list(range(first_id, last_id + 1))
+        conn.executemany(_INSERT_TAG, (row for task_id, t in zip(ids, tasks_data)
+                                       for row in _tag_rows(task_id, t.get('tags'))))
+    return ids
+
+# Лимит параметров в одном запросе: старые сборки SQLite допускают не больше 999
+ID_CHUNK_SIZE = 500
+
+def get_task(task_id):
+    tasks = _fetch_tasks("SELECT * FROM tasks WHERE id = ?", (task_id,))
+    return tasks[0] if tasks else None
+
+def get_tasks(task_ids):
+    # Выборка по первичному ключу пачками WHERE id IN (...); порядок — как в task_ids
+    task_ids = list(task_ids)
+    found = {}
+    for i in range(0, len(task_ids), ID_CHUNK_SIZE):
+        chunk = task_ids[i:i + ID_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        for t in _fetch_tasks(f"SELECT * FROM tasks WHERE id IN ({placeholders})", chunk):
+            found[t.id] = t
+    return [found[tid] for tid in task_ids if tid in found]
 
 def get_all_tasks_ordered():
     # high → medium → low, затем по дате создания
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * FROM tasks
-        ORDER BY
-            CASE priority
-                WHEN 'high' THEN 1
-                WHEN 'medium' THEN 2
-                WHEN 'low' THEN 3
-            END,
-            created_at DESC
-    """)
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    return _fetch_tasks(f"SELECT * FROM tasks ORDER BY {PRIORITY_ORDER}, created_at DESC")
 
 def get_all_tasks():
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tasks ORDER BY created_at DESC")
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    return _fetch_tasks("SELECT * FROM tasks ORDER BY created_at DESC")
 
 def get_tasks_by_category(category):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE category = ? ORDER BY created_at DESC", (category,))
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    return _fetch_tasks("SELECT * FROM tasks WHERE category = ? ORDER BY created_at DESC", (category,))
 
 def get_tasks_by_status(status):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC", (status,))
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    return _fetch_tasks("SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC", (status,))
 
 def get_tasks_by_deadline(start_date=None, end_date=None):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
     query = "SELECT * FROM tasks WHERE 1=1"
     params = []
     if start_date:
@@ -110,35 +312,244 @@ def get_tasks_by_deadline(start_date=None, end_date=None):
         query += " AND deadline <= ?"
         params.append(end_date)
     query += " ORDER BY deadline ASC"
+    return _fetch_tasks(query, params)
+
+def get_tasks_in_range(start_date, end_date):
+    # Окно дат (например, видимый месяц) — поиск по индексу idx_tasks_deadline_created
+    return _fetch_tasks(
+        "SELECT * FROM tasks WHERE deadline BETWEEN ? AND ? ORDER BY deadline, created_at DESC",
+        (start_date, end_date))
+
+# Допустимые сортировки для query_tasks
+TASK_ORDERS = {
+    'rank': "tasks_fts.rank",
+    'priority': f"{PRIORITY_ORDER}, created_at DESC",
+    'created': "created_at DESC",
+    'deadline': "deadline, created_at DESC",
+    'id': "tasks.id",
+    # сортировки по столбцам списка задач
+    'title': "title, tasks.id",
+    'category': "tasks.category, tasks.id",
+    'status': "status, tasks.id",
+    'created_at': "created_at, tasks.id",
+}
+
+# Наличие FTS5 по пути к БД: схема меняется только миграциями, проверяем один раз
+_fts_available = {}
+
+def has_fts():
+    path = get_db_path()
+    if path not in _fts_available:
+        _fts_available[path] = get_connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone() is not None
+    return _fts_available[path]
+
+def fts_query(keyword):
+    # Каждое слово — префиксный поиск, слова объединяются через AND
+    words = keyword.split()
+    return " ".join('"' + w.replace('"', '""') + '"*' for w in words)
+
+# Режимы фильтра по нескольким тегам: все теги сразу (AND) или любой из них (OR)
+TAG_MODES = ('all', 'any')
+
+def _tag_subquery(tags, tags_mode='all'):
+    # Подзапрос id задач с тегами по первичному ключу task_tags; (None, []) — без фильтра
+    if tags_mode not in TAG_MODES:
+        raise ValueError(f"неизвестный режим фильтра тегов: {tags_mode}")
+    tags = split_tags(tags)
+    if not tags:
+        return None, []
+    query = f"SELECT task_id FROM task_tags WHERE tag IN ({', '.join('?' * len(tags))})"
+    params = list(tags)
+    if tags_mode == 'all' and len(tags) > 1:
+        query += " GROUP BY task_id HAVING COUNT(*) = ?"
+        params.append(len(tags))
+    return query, params
+
+def _build_task_query(columns="tasks.*", status=None, category=None, keyword=None,
+                      deadline_range=None, order=None, limit=None, offset=None,
+                      tags=None, tags_mode='all'):
+    source = "tasks"
+    where = []
+    params = []
+    tag_query, tag_params = _tag_subquery(tags, tags_mode)
+    if tag_query:
+        where.append(f"tasks.id IN ({tag_query})")
+        params.extend(tag_params)
+    if keyword and keyword.split():
+        if has_fts():
+            source = "tasks JOIN tasks_fts ON tasks_fts.rowid = tasks.id"
+            where.append("tasks_fts MATCH ?")
+            params.append(fts_query(keyword))
+        else:
+            where.append("(instr(casefold(title), ?) OR instr(casefold(description), ?)"
+                         " OR instr(casefold(category), ?) OR instr(casefold(tags), ?))")
+            params.extend([keyword.casefold()] * 4)
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if category:
+        where.append("tasks.category = ?")
+        params.append(category)
+    if deadline_range:
+        start_date, end_date = deadline_range
+        if start_date:
+            where.append("deadline >= ?")
+            params.append(start_date)
+        if end_date:
+            where.append("deadline <= ?")
+            params.append(end_date)
+    if order == 'rank' and source == "tasks":
+        # без полнотекстового поиска ранга нет
+        order = 'priority'
+    query = f"SELECT {columns} FROM {source}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    if order:
+        query += " ORDER BY " + TASK_ORDERS[order]
+    if limit is not None or offset:
+        # OFFSET в SQLite допустим только после LIMIT; -1 — без ограничения
+        query += " LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else limit, offset or 0])
+    return query, params
+
+def query_tasks(status=None, category=None, keyword=None, deadline_range=None,
+                order='priority', limit=None, offset=0, tags=None, tags_mode='all'):
+    # Фильтры списка задач одним параметризованным запросом; None — без фильтра.
+    # tags — строка или список тегов, tags_mode — 'all' (все теги) или 'any' (любой)
+    query, params = _build_task_query(status=status, category=category, keyword=keyword,
+                                      deadline_range=deadline_range, order=order,
+                                      limit=limit, offset=offset, tags=tags, tags_mode=tags_mode)
+    return _fetch_tasks(query, params)
+
+def iter_tasks(status=None, category=None, keyword=None, deadline_range=None,
+               order='priority', chunk_size=500, tags=None, tags_mode='all'):
+    # Потоковое чтение с фильтрами query_tasks: в памяти не больше chunk_size строк
+    query, params = _build_task_query(status=status, category=category, keyword=keyword,
+                                      deadline_range=deadline_range, order=order,
+                                      tags=tags, tags_mode=tags_mode)
+    cursor = get_connection().cursor()
+    cursor.row_factory = task_row_factory
     cursor.execute(query, params)
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+def search_task_ids(keyword, status=None, category=None):
+    # id задач в порядке релевантности полнотекстового поиска
+    query, params = _build_task_query(columns="tasks.id", status=status, category=category,
+                                      keyword=keyword, order='rank')
+    return [row[0] for row in get_connection().execute(query, params)]
+
+def count_tasks(status=None, category=None, keyword=None, deadline_range=None,
+                tags=None, tags_mode='all'):
+    query, params = _build_task_query(columns="COUNT(*)", status=status, category=category,
+                                      keyword=keyword, deadline_range=deadline_range,
+                                      tags=tags, tags_mode=tags_mode)
+    return get_connection().execute(query, params).fetchone()[0]
 
 def update_task_status(task_id, new_status):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("UPDATE tasks SET status = ? WHERE id = ?", (new_status, task_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("UPDATE tasks SET status = ? WHERE id = ?", (new_status, task_id))
+
+def update_statuses(task_ids, new_status):
+    with transaction() as conn:
+        conn.executemany("UPDATE tasks SET status = ? WHERE id = ?",
+                         [(new_status, tid) for tid in task_ids])
+
+def update_reminders(task_ids, reminder):
+    with transaction() as conn:
+        conn.executemany("UPDATE tasks SET reminder = ? WHERE id = ?",
+                         [(reminder, tid) for tid in task_ids])
+
+def get_upcoming_reminders(since):
+    # (id, reminder) незавершённых задач с напоминанием не раньше since, по времени
+    return get_connection().execute(
+        "SELECT id, reminder FROM tasks WHERE reminder IS NOT NULL AND status <> 'completed' "
+        "AND reminder >= ? ORDER BY reminder", (since,)).fetchall()
+
+def update_tags(task_ids, tags):
+    # Новая строка тегов для задач; task_tags пересобирается в той же транзакции
+    with transaction() as conn:
+        conn.executemany("UPDATE tasks SET tags = ? WHERE id = ?", [(tags, tid) for tid in task_ids])
+        conn.executemany("DELETE FROM task_tags WHERE task_id = ?", [(tid,) for tid in task_ids])
+        conn.executemany(_INSERT_TAG, (row for tid in task_ids for row in _tag_rows(tid, tags)))
 
 def delete_task(task_id):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+def delete_tasks(task_ids):
+    with transaction() as conn:
+        conn.executemany("DELETE FROM tasks WHERE id = ?", [(tid,) for tid in task_ids])
+
+# ====== Повторения ======
+def get_occurrence_overrides():
+    # {task_id: {дата: статус}} для всех переопределённых повторений
+    result = {}
+    for task_id, day, status in get_connection().execute(
+            "SELECT task_id, occurrence_date, status FROM task_occurrences"):
+        result.setdefault(task_id, {})[day] = status
+    return result
+
+def set_occurrence_status(task_id, day, status):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO task_occurrences(task_id, occurrence_date, status) "
+                     "VALUES (?, ?, ?)", (task_id, day, status))
+
+# ====== Теги ======
+def task_ids_with_tags(tags, tags_mode='all'):
+    # id задач с тегами: 'all' — со всеми сразу, 'any' — хотя бы с одним
+    query, params = _tag_subquery(tags, tags_mode)
+    if not query:
+        return []
+    return [row[0] for row in get_connection().execute(query, params)]
+
+def get_tags():
+    # [(тег, число задач)] по алфавиту — обход индекса, таблица tasks не читается
+    return get_connection().execute(
+        "SELECT tag, COUNT(*) FROM task_tags GROUP BY tag ORDER BY tag").fetchall()
 
 def search_tasks(keyword):
-    conn = sqlite3.connect(get_db_path())
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM tasks 
-        WHERE title LIKE ? OR description LIKE ? OR category LIKE ?
-        ORDER BY created_at DESC
-    ''', (f'%{keyword}%', f'%{keyword}%', f'%{keyword}%'))
-    tasks = cursor.fetchall()
-    conn.close()
-    return tasks
+    # Ранжированный префиксный поиск по названию, описанию, категории и тегам
+    return query_tasks(keyword=keyword, order='rank')
+
+# ====== Настройки и категории ======
+def get_settings():
+    # Все настройки: ключ → значение (хранится как JSON)
+    result = {}
+    for key, value in get_connection().execute("SELECT key, value FROM settings"):
+        try:
+            result[key] = json.loads(value)
+        except (TypeError, ValueError):
+            result[key] = value
+    return result
+
+def save_settings(changes):
+    # Одна транзакция на все изменённые ключи
+    with transaction() as conn:
+        conn.executemany("INSERT OR REPLACE INTO settings(key, value) VALUES (?, ?)",
+                         [(key, json.dumps(value, ensure_ascii=False)) for key, value in changes.items()])
+
+def data_version():
+    # Меняется после любого коммита: data_version — чужие соединения (второй экземпляр,
+    # поток БД), total_changes — своё
+    conn = get_connection()
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+def get_categories():
+    return [row[0] for row in get_connection().execute("SELECT name FROM categories ORDER BY id")]
 
+def add_category(name):
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO categories(name) VALUES (?)", (name,))
 
+def remove_category(name):
+    # Задачи сохраняют текст категории; из списка выбора она пропадает
+    with transaction() as conn:
+        conn.execute("DELETE FROM categories WHERE name = ?", (name,))
@@ -0,0 +1,138 @@
+import queue
+import sys
+import threading
+
+# Как часто поток Tk забирает готовые результаты, пока есть незавершённые запросы, мс
+POLL_MS = 15
+
+
+class _Request:
+    __slots__ = ("fn", "args", "kwargs", "key", "on_done", "on_error", "on_step", "cancelled")
+
+    def __init__(self, fn, args, kwargs, key, on_done, on_error, on_step):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_step = on_step
+        self.cancelled = False
+
+
+class DatabaseWorker:
+    # Один фоновый поток для всех обращений к БД: запросы выполняются строго по очереди,
+    # результаты и ошибки возвращаются в поток Tk через root.after. Очередь результатов
+    # опрашивается, только пока есть незавершённые запросы.
+    # Запрос с ключом key, который ещё не начал выполняться, заменяется новым с тем же
+    # ключом — серия одинаковых обновлений схлопывается в одно выполнение
+    def __init__(self, root, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued = {}  # key → ещё не начатый запрос
+        self._pending = 0
+        self._poll_job = None
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+
+    # ====== Поток Tk ======
+    def submit(self, fn, *args, key=None, on_done=None, on_error=None, **kwargs):
+        # fn(*args, **kwargs) выполнится в фоновом потоке; on_done(result) или
+        # on_error(exc) будут вызваны в потоке Tk
+        return self._submit(fn, args, kwargs, key, on_done, on_error, None)
+
+    def steps(self, fn, *args, key=None, on_step=None, on_done=None, on_error=None, **kwargs):
+        # fn(*args, **kwargs) — генератор; каждое отданное значение приходит в on_step,
+        # последнее — ещё и в on_done. Между шагами запрос можно отменить через cancel()
+        return self._submit(fn, args, kwargs, key, on_done, on_error, on_step)
+
+    def cancel(self, request):
+        request.cancelled = True
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def close(self, timeout=2.0):
+        self._requests.put(None)
+        self._thread.join(timeout)
+
+    def _submit(self, fn, args, kwargs, key, on_done, on_error, on_step):
+        with self._lock:
+            request = self._queued.get(key) if key is not None else None
+            if request is not None:
+                # поток ещё не взял запрос — подменяем аргументы и обработчики
+                request.fn, request.args, request.kwargs = fn, args, kwargs
+                request.on_done, request.on_error, request.on_step = on_done, on_error, on_step
+                return request
+            request = _Request(fn, args, kwargs, key, on_done, on_error, on_step)
+            if key is not None:
+                self._queued[key] = request
+        self._pending += 1
+        self._requests.put(request)
+        if self._poll_job is None:
+            self._poll_job = self.root.after(self.poll_ms, self._poll)
+        return request
+
+    def _poll(self):
+        self._poll_job = None
+        while True:
+            try:
+                kind, request, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind != "step":
+                self._pending -= 1
+            if request.cancelled:
+                continue
+            try:
+                if kind == "step":
+                    request.on_step(value)
+                elif kind == "done":
+                    if request.on_done is not None:
+                        request.on_done(value)
+                elif request.on_error is not None:
+                    request.on_error(value)
+                else:
+                    self.root.report_callback_exception(type(value), value, value.__traceback__)
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+        if self._pending:
+            self._poll_job = self.root.after(self.poll_ms, self._poll)
+
+    # ====== Фоновый поток ======
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            with self._lock:
+                if request.key is not None and self._queued.get(request.key) is request:
+                    del self._queued[request.key]
+            if request.cancelled:
+                self._results.put(("cancelled", request, None))
+                continue
+            try:
+                if request.on_step is None:
+                    result = request.fn(*request.args, **request.kwargs)
+                else:
+                    result = self._run_steps(request)
+            except Exception as e:
+                self._results.put(("error", request, e))
+            else:
+                self._results.put(("done", request, result))
+
+    def _run_steps(self, request):
+        last = None
+        steps = request.fn(*request.args, **request.kwargs)
+        try:
+            for last in steps:
+                self._results.put(("step", request, last))
+                if request.cancelled:
+                    break
+        finally:
+            steps.close()
+        return last
@@ -0,0 +1,341 @@
+import bisect
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import connection
+
+# Замеры включаются в TaskPlannerApp (install); PLANNER_DIAGNOSTICS=0 — выключить.
+# PLANNER_DIAGNOSTICS_DUMP=<файл> — JSON со всеми замерами при закрытии программы,
+# PLANNER_SLOW_LOG=1 — печатать медленные операции в stderr
+ENABLED_ENV = "PLANNER_DIAGNOSTICS"
+DUMP_ENV = "PLANNER_DIAGNOSTICS_DUMP"
+SLOW_LOG_ENV = "PLANNER_SLOW_LOG"
+
+# Верхние границы корзин гистограммы, мс; последняя корзина — всё, что дольше
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Операция дольше этого попадает в журнал медленных вместе со своими SQL-запросами.
+# Кадр при 60 Гц — 16 мс, 50 мс — уже заметная заминка интерфейса
+SLOW_MS = 50
+MAX_SLOW_ENTRIES = 200
+MAX_STATEMENTS = 20       # SQL-запросов одной операции в журнале
+MAX_TEXT = 300            # длина SQL и параметров в журнале
+PROFILE_LINES = 40
+# Служебные функции database: вызываются внутри остальных и только шумели бы
+NOT_TIMED = ("get_db_path", "get_connection", "transaction")
+
+enabled = False
+slow_ms = SLOW_MS
+
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}
+_slow = deque(maxlen=MAX_SLOW_ENTRIES)
+_since = time.time()
+_profiler = None
+_last_profile = None
+
+
+class Histogram:
+    # Число замеров по корзинам BUCKETS_MS; процентили — с точностью до границы корзины
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if self.min is None or ms < self.min:
+            self.min = ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min or 0.0, 3),
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": {(f"<={b}" if i < len(BUCKETS_MS) else f">{BUCKETS_MS[-1]}"): n
+                        for i, (b, n) in enumerate(zip(BUCKETS_MS + (None,), self.counts)) if n},
+        }
+
+
+# ====== Замеры ======
+def _text(value):
+    text = " ".join(str(value).split())
+    return text if len(text) <= MAX_TEXT else text[:MAX_TEXT] + "…"
+
+
+def record(name, seconds, statements=None):
+    ms = seconds * 1000
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.add(ms)
+    if ms < slow_ms:
+        return
+    entry = {
+        "at": datetime.now().isoformat(timespec="milliseconds"),
+        "operation": name,
+        "ms": round(ms, 3),
+        "thread": threading.current_thread().name,
+        "statements": [{"sql": _text(sql), "params": _text(params), "execute_ms": round(s * 1000, 3)}
+                       for sql, params, s in statements or ()],
+    }
+    with _lock:
+        _slow.append(entry)
+    if os.environ.get(SLOW_LOG_ENV):
+        print(f"Медленно: {name} {ms:.1f} мс", file=sys.stderr)
+        for st in entry["statements"]:
+            print(f"    {st['execute_ms']:.1f} мс  {st['sql']}  {st['params']}", file=sys.stderr)
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def measure(name):
+    # Время блока в гистограмму name; SQL, выполненные внутри, — в журнал медленных
+    if not enabled:
+        yield
+        return
+    statements = []
+    stack = _stack()
+    stack.append(statements)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        record(name, elapsed, statements)
+
+
+def timed(name):
+    # Декоратор: каждый вызов — замер name. У генератора считается только время
+    # внутри него, без времени того, кто его читает
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not enabled:
+                    yield from fn(*args, **kwargs)
+                    return
+                it = fn(*args, **kwargs)
+                spent = 0.0
+                statements = []
+                stack = _stack()
+                try:
+                    while True:
+                        stack.append(statements)
+                        start = time.perf_counter()
+                        try:
+                            value = next(it)
+                        except StopIteration:
+                            break
+                        finally:
+                            spent += time.perf_counter() - start
+                            stack.pop()
+                        yield value
+                finally:
+                    it.close()
+                    record(name, spent, statements)
+            return wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            # то же, что measure(), без генератора contextmanager на каждый вызов
+            statements = []
+            stack = _stack()
+            stack.append(statements)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stack.pop()
+                record(name, elapsed, statements)
+        return wrapper
+    return decorate
+
+
+def _note_statement(sql, params, seconds):
+    for statements in _stack():
+        if len(statements) < MAX_STATEMENTS:
+            statements.append((sql, params, seconds))
+
+
+class TracedCursor(sqlite3.Cursor):
+    # Курсор, запоминающий SQL и параметры для операции, внутри которой выполняется.
+    # Время — только execute (первый шаг запроса); выборка строк входит во время операции
+    def execute(self, sql, parameters=()):
+        if not enabled or not getattr(_local, "stack", None):
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _note_statement(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not enabled or not getattr(_local, "stack", None):
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # параметры могут быть генератором — не перечитываем
+            _note_statement(sql, "executemany", time.perf_counter() - start)
+
+
+class TracedConnection(sqlite3.Connection):
+    # Connection.execute в C создаёт обычный курсор, поэтому переопределяем и его
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def instrument(module, prefix=None, skip=NOT_TIMED):
+    # Оборачивает публичные функции модуля замерами "<prefix>.<имя>". Вызовы через
+    # атрибут модуля (database.query_tasks) идут через обёртку, в том числе изнутри модуля
+    prefix = prefix or module.__name__
+    for name, fn in list(vars(module).items()):
+        if (name.startswith("_") or name in skip or not inspect.isfunction(fn)
+                or fn.__module__ != module.__name__ or hasattr(fn, "__wrapped__")):
+            continue
+        setattr(module, name, timed(f"{prefix}.{name}")(fn))
+
+
+def install():
+    global enabled
+    import database
+    enabled = os.environ.get(ENABLED_ENV, "1") != "0"
+    instrument(database)
+    _trace_connections(enabled)
+
+
+def set_enabled(value):
+    global enabled
+    enabled = bool(value)
+    _trace_connections(enabled)
+
+
+def _trace_connections(value):
+    # Действует на соединения, открытые после вызова: install() вызывается до первого
+    # соединения, а включённые позже замеры до переоткрытия собирают только время операций
+    connection.connection_factory = TracedConnection if value else sqlite3.Connection
+
+
+# ====== Профилирование ======
+def profiling():
+    return _profiler is not None
+
+
+def start_profile():
+    # cProfile в вызывающем потоке (потоке Tk); поток БД виден по замерам database.*
+    global _profiler
+    if _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def stop_profile(lines=PROFILE_LINES):
+    # Останавливает профилирование; возвращает верх таблицы по суммарному времени
+    global _profiler, _last_profile
+    if _profiler is None:
+        return _last_profile
+    _profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(_profiler, stream=out).sort_stats("cumulative").print_stats(lines)
+    _profiler = None
+    _last_profile = out.getvalue()
+    return _last_profile
+
+
+def last_profile():
+    return _last_profile
+
+
+# ====== Отчёт ======
+def histograms():
+    with _lock:
+        return {name: hist.as_dict() for name, hist in _histograms.items()}
+
+
+def slow_operations():
+    with _lock:
+        return list(_slow)
+
+
+def reset():
+    global _since
+    with _lock:
+        _histograms.clear()
+        _slow.clear()
+        _since = time.time()
+
+
+def snapshot(extra=None):
+    data = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "since": datetime.fromtimestamp(_since).isoformat(timespec="seconds"),
+        "enabled": enabled,
+        "slow_ms": slow_ms,
+        "operations": histograms(),
+        "slow": slow_operations(),
+        "profile": _last_profile,
+    }
+    if extra:
+        data.update(extra)
+    return data
+
+
+def dump(path, extra=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(extra), f, ensure_ascii=False, indent=2)
+    return path
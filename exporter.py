@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import database
+import recurrence
+from models import TASK_COLUMNS
+
+# Сколько строк читается из курсора за раз и пишется между шагами цикла событий Tk
+EXPORT_CHUNK_SIZE = 1000
+
+ICS_PRIORITY = {"high": 1, "medium": 5, "low": 9}
+ICS_STATUS = {"pending": "NEEDS-ACTION", "in progress": "IN-PROCESS",
+              "completed": "COMPLETED", "postponed": "NEEDS-ACTION"}
+
+
+class CsvWriter:
+    # Заголовки — имена столбцов БД, importer.py читает такой файл обратно
+    encoding = "utf-8-sig"
+
+    def begin(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(TASK_COLUMNS)
+
+    def write(self, task):
+        self.writer.writerow(["" if getattr(task, c) is None else getattr(task, c) for c in TASK_COLUMNS])
+
+    def end(self, f):
+        pass
+
+
+class JsonLinesWriter:
+    encoding = "utf-8"
+
+    def begin(self, f):
+        self.f = f
+
+    def write(self, task):
+        self.f.write(json.dumps({c: getattr(task, c) for c in TASK_COLUMNS}, ensure_ascii=False))
+        self.f.write("\n")
+
+    def end(self, f):
+        pass
+
+
+def _ics_text(value):
+    return (value or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_fold(line):
+    # RFC 5545: строки длиннее 75 октетов переносятся, продолжение начинается с пробела
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    while data:
+        size = 75 if not parts else 74
+        cut = min(size, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1  # не режем многобайтовый символ
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+class IcsWriter:
+    # Задачи как VTODO: дедлайн — DUE (у повторяющихся — DTSTART), статус и приоритет по RFC 5545
+    encoding = "utf-8"
+
+    def begin(self, f):
+        self.f = f
+        self.stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        for line in ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//TaskPlanner//RU", "CALSCALE:GREGORIAN"):
+            f.write(line + "\r\n")
+
+    def write(self, task):
+        lines = ["BEGIN:VTODO", f"UID:task-{task.id}@taskplanner", f"DTSTAMP:{self.stamp}",
+                 f"SUMMARY:{_ics_text(task.title)}"]
+        if task.created_at:
+            lines.append("CREATED:" + task.created_at.replace("-", "").replace(":", "").replace(" ", "T") + "Z")
+        if task.description:
+            lines.append(f"DESCRIPTION:{_ics_text(task.description)}")
+        if task.deadline:
+            rule = recurrence.rule_for(task)
+            if rule is not None:
+                # RRULE у VTODO отсчитывается от DTSTART — первым повторением и дедлайном.
+                # DUE не пишем: по RFC 5545 он должен быть позже DTSTART
+                lines.append(f"DTSTART;VALUE=DATE:{task.deadline.replace('-', '')}")
+                lines.append(f"RRULE:{rule.to_rrule()}")
+            else:
+                lines.append(f"DUE;VALUE=DATE:{task.deadline.replace('-', '')}")
+        if task.category:
+            lines.append(f"CATEGORIES:{_ics_text(task.category)}")
+        lines.append(f"PRIORITY:{ICS_PRIORITY.get(task.priority, 0)}")
+        lines.append(f"STATUS:{ICS_STATUS.get(task.status, 'NEEDS-ACTION')}")
+        lines.append("END:VTODO")
+        self.f.write("".join(_ics_fold(line) for line in lines))
+
+    def end(self, f):
+        f.write("END:VCALENDAR\r\n")
+
+
+FORMATS = {"csv": CsvWriter, "jsonl": JsonLinesWriter, "ics": IcsWriter}
+
+
+def format_from_path(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"json": "jsonl", "ical": "ics"}.get(ext, ext) if ext else "csv"
+
+
+def export_steps(path, fmt=None, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    # Пишет задачи прямо в файл, читая курсор пачками; после каждой пачки отдаёт
+    # число записанных задач, чтобы UI мог показать прогресс и обработать события
+    fmt = fmt or format_from_path(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"неизвестный формат экспорта: {fmt}")
+    writer = FORMATS[fmt]()
+    count = 0
+    with open(path, "w", encoding=writer.encoding, newline="") as f:
+        writer.begin(f)
+        for task in database.iter_tasks(chunk_size=chunk_size, **filters):
+            writer.write(task)
+            count += 1
+            if count % chunk_size == 0:
+                yield count
+        writer.end(f)
+    yield count
+
+
+def export_tasks(path, fmt=None, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    count = 0
+    for count in export_steps(path, fmt, chunk_size, **filters):
+        pass
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="exporter", description="Экспорт задач TaskPlanner")
+    parser.add_argument("output", help="файл для записи (.csv, .jsonl, .ics)")
+    parser.add_argument("--format", choices=sorted(FORMATS), help="формат; по умолчанию — по расширению")
+    parser.add_argument("--db", help="путь к planner.db")
+    parser.add_argument("--storage", choices=sorted(database.connection.STORAGE_PROFILES),
+                        help="профиль хранения SQLite (по умолчанию — PLANNER_STORAGE_PROFILE или default)")
+    parser.add_argument("--status", choices=["pending", "in progress", "completed", "postponed"])
+    parser.add_argument("--category")
+    parser.add_argument("--search", help="ключевые слова (как поле «Поиск» в списке)")
+    parser.add_argument("--tag", action="append", dest="tags", help="тег; можно указать несколько раз")
+    parser.add_argument("--any-tag", action="store_true", help="задачи с любым из тегов, а не со всеми")
+    parser.add_argument("--from", dest="date_from", help="дедлайн не раньше YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="дедлайн не позже YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_NAME = args.db
+    database.init_db(args.storage)
+    deadline_range = (args.date_from, args.date_to) if args.date_from or args.date_to else None
+    try:
+        count = export_tasks(args.output, args.format, status=args.status, category=args.category,
+                             keyword=args.search, deadline_range=deadline_range,
+                             tags=args.tags, tags_mode='any' if args.any_tag else 'all',
+                             order='rank' if args.search else 'priority')
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Экспортировано задач: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
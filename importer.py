@@ -0,0 +1,175 @@
+import csv
+import io
+import itertools
+from datetime import date, datetime
+
+import database
+import recurrence
+import reminders
+
+# Сколько строк вставляется одной транзакцией и между шагами обработки событий Tk
+IMPORT_CHUNK_SIZE = 1000
+# Сколько ошибок держим с текстом; остальные только считаем
+MAX_REPORTED_ERRORS = 200
+
+PRIORITY_VALUES = {"низкий": "low", "средний": "medium", "высокий": "high",
+                   "low": "low", "medium": "medium", "high": "high"}
+STATUS_VALUES = {"в ожидании": "pending", "в процессе": "in progress", "завершено": "completed",
+                 "отложено": "postponed", "pending": "pending", "in progress": "in progress",
+                 "completed": "completed", "postponed": "postponed"}
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S")
+
+# Заголовок столбца → поле задачи (русские заголовки списка и английские имена столбцов БД)
+HEADER_FIELDS = {
+    "название": "title", "title": "title",
+    "описание": "description", "description": "description",
+    "категория": "category", "category": "category",
+    "приоритет": "priority", "priority": "priority",
+    "статус": "status", "status": "status",
+    "дедлайн": "deadline", "deadline": "deadline",
+    "теги": "tags", "tags": "tags",
+    "повтор": "recurrence", "recurrence": "recurrence",
+    "напоминание": "reminder", "reminder": "reminder",
+}
+# Формат копирования из списка задач без заголовка:
+# ID, Название, Категория, Приоритет, Статус, Создано, Дедлайн
+LEGACY_COLUMNS = {1: "title", 2: "category", 3: "priority", 4: "status", 6: "deadline"}
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []  # (номер строки, сообщение)
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+
+def read_text(text):
+    # Строки текста из буфера обмена без разбиения всего текста в список
+    return io.StringIO(text)
+
+
+def read_file(path):
+    # Генератор строк файла; файл читается потоково и закрывается по завершении
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from f
+
+
+def _sniff_delimiter(first_line):
+    if "\t" in first_line:
+        return "\t"
+    try:
+        return csv.Sniffer().sniff(first_line, delimiters=",;").delimiter
+    except csv.Error:
+        return "\t"
+
+
+def detect_mapping(first_row):
+    # Возвращает (mapping, есть_заголовок); mapping — индекс столбца → поле задачи
+    mapping = {}
+    for i, cell in enumerate(first_row):
+        field = HEADER_FIELDS.get(cell.strip().lower())
+        if field and field not in mapping.values():
+            mapping[i] = field
+    if "title" in mapping.values():
+        return mapping, True
+    if len(first_row) >= 7:
+        return dict(LEGACY_COLUMNS), False
+    return None, False
+
+
+def looks_like_table(text):
+    # Текст из буфера похож на таблицу: есть табуляция или CSV-заголовок с «Названием»
+    first_line = text.lstrip().split("\n", 1)[0]
+    if "\t" in first_line:
+        return True
+    row = next(csv.reader([first_line], delimiter=_sniff_delimiter(first_line)), [])
+    return detect_mapping(row)[1]
+
+
+def _parse_date(value):
+    if len(value) == 10:
+        try:
+            # быстрый путь для ISO-дат (основной формат экспорта)
+            return date.fromisoformat(value).isoformat()
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"неверная дата «{value}»")
+
+
+def _to_task(cells, mapping):
+    data = {'title': '', 'description': '', 'deadline': None, 'priority': 'medium',
+            'category': '', 'status': 'pending', 'tags': '', 'recurrence': None, 'reminder': None}
+    for i, field in mapping.items():
+        value = cells[i].strip() if i < len(cells) else ""
+        if not value:
+            continue
+        if field == "priority":
+            if value.lower() not in PRIORITY_VALUES:
+                raise ValueError(f"неизвестный приоритет «{value}»")
+            value = PRIORITY_VALUES[value.lower()]
+        elif field == "status":
+            if value.lower() not in STATUS_VALUES:
+                raise ValueError(f"неизвестный статус «{value}»")
+            value = STATUS_VALUES[value.lower()]
+        elif field == "deadline":
+            value = _parse_date(value)
+        elif field == "recurrence":
+            value = recurrence.parse_rule(value).to_rrule()
+        elif field == "reminder":
+            value = reminders.normalize_reminder(value)
+        data[field] = value
+    data['title'] = data['title'] or "Без названия"
+    return data
+
+
+def parse(lines, result):
+    # Генератор задач из строк TSV/CSV; ошибки строк складываются в result
+    lines = iter(lines)
+    first_line = next(lines, None)
+    while first_line is not None and not first_line.strip():
+        first_line = next(lines, None)
+    if first_line is None:
+        return
+    reader = csv.reader(itertools.chain([first_line], lines), delimiter=_sniff_delimiter(first_line))
+    first_row = next(reader, None)
+    mapping, has_header = detect_mapping(first_row or [])
+    if mapping is None:
+        result.add_error(1, "не удалось определить столбцы: нужен заголовок со столбцом «Название» "
+                            "или 7 столбцов в формате списка задач")
+        return
+    rows = reader if has_header else itertools.chain([first_row], reader)
+    for row in rows:
+        line_no = reader.line_num
+        if not any(cell.strip() for cell in row):
+            continue
+        result.processed += 1
+        try:
+            yield _to_task(row, mapping)
+        except ValueError as e:
+            result.add_error(line_no, str(e))
+
+
+def import_tasks(lines, add_tasks=database.add_tasks, chunk_size=IMPORT_CHUNK_SIZE):
+    # Потоковый импорт: память ограничена одной пачкой, каждая пачка — одна транзакция.
+    # Генератор отдаёт ImportResult после каждой пачки, чтобы вызывающий мог показать
+    # прогресс и вернуть управление циклу событий
+    result = ImportResult()
+    tasks = parse(lines, result)
+    while True:
+        chunk = list(itertools.islice(tasks, chunk_size))
+        if not chunk:
+            break
+        result.inserted += len(add_tasks(chunk))
+        yield result
+    yield result
@@ -1,9 +1,17 @@
+import time
+_started_at = time.perf_counter()
+
+import sys
 import tkinter as tk
-from ui import TaskPlannerApp
 
 def main():
+    # python main.py export <файл> [фильтры] — экспорт без запуска интерфейса
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        import exporter
+        sys.exit(exporter.main(sys.argv[2:]))
+    from ui import TaskPlannerApp
     root = tk.Tk()
-    app = TaskPlannerApp(root)
+    app = TaskPlannerApp(root, started_at=_started_at)
     root.mainloop()
 
 if __name__ == "__main__":
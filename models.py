@@ -0,0 +1,101 @@
+import re
+import sys
+
+PRIORITY_DISPLAY = {"low":"Низкий","medium":"Средний","high":"Высокий"}
+STATUS_DISPLAY = {"pending":"В ожидании","in progress":"В процессе","completed":"Завершено","postponed":"Отложено"}
+
+# Порядок столбцов таблицы tasks (SELECT *)
+TASK_COLUMNS = ("id", "title", "description", "created_at", "deadline", "priority",
+                "category", "status", "tags", "recurrence", "reminder")
+
+
+# Теги в tasks.tags пишутся через запятую, точку с запятой или с «#»: "работа, #срочно"
+_TAG_SEPARATORS = re.compile(r"[,;#]")
+
+
+def split_tags(tags):
+    # Нормализованные теги (без пробелов по краям, casefold) без повторов, в исходном порядке.
+    # tags — строка tasks.tags или список таких строк
+    if not tags:
+        return []
+    if not isinstance(tags, str):
+        tags = ",".join(tags)
+    result = []
+    for tag in _TAG_SEPARATORS.split(tags):
+        tag = " ".join(tag.split()).casefold()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+
+def _intern(value):
+    # категории, статусы и приоритеты повторяются тысячи раз — храним одну копию строки
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Task:
+    # Строка таблицы tasks. Поля для отображения считаются один раз при загрузке
+    __slots__ = TASK_COLUMNS + ("created_date", "priority_label", "status_label")
+
+    def __init__(self, id, title, description=None, created_at=None, deadline=None,
+                 priority="medium", category=None, status="pending", tags=None,
+                 recurrence=None, reminder=None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.created_at = created_at
+        self.deadline = _intern(deadline)
+        self.priority = _intern(priority)
+        self.category = _intern(category)
+        self.status = _intern(status)
+        self.tags = tags
+        self.recurrence = recurrence
+        self.reminder = reminder
+        if created_at:
+            self.created_date = created_at.split()[0] if isinstance(created_at, str) else str(created_at)[:10]
+        else:
+            self.created_date = ""
+        self.priority_label = PRIORITY_DISPLAY.get(priority, priority)
+        self.status_label = STATUS_DISPLAY.get(status, status)
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in TASK_COLUMNS}
+        values.update(changes)
+        return Task(**values)
+
+    def to_data(self):
+        # Словарь в формате task_data для database.add_task(s)
+        return {name: getattr(self, name) for name in TASK_COLUMNS if name != "id"}
+
+    def __eq__(self, other):
+        if not isinstance(other, Task):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in TASK_COLUMNS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Task(id={self.id!r}, title={self.title!r}, deadline={self.deadline!r}, status={self.status!r})"
+
+
+def task_row_factory(cursor, row):
+    # row_factory для курсоров, выбирающих tasks.* — строит Task вместо кортежа
+    return Task(*row)
+
+
+class Occurrence:
+    # Одно повторение задачи на дату (см. recurrence.py). Дата и статус — свои
+    # (статус может быть переопределён для этого дня), остальные поля — задачи
+    __slots__ = ("task", "deadline", "status", "status_label")
+
+    def __init__(self, task, day, status=None):
+        self.task = task
+        self.deadline = day
+        self.status = status or task.status
+        self.status_label = STATUS_DISPLAY.get(self.status, self.status)
+
+    def __getattr__(self, name):
+        return getattr(self.task, name)
+
+    def __repr__(self):
+        return f"Occurrence(id={self.task.id!r}, title={self.task.title!r}, date={self.deadline!r}, status={self.status!r})"
@@ -0,0 +1,165 @@
+import calendar as pycalendar
+import tkinter as tk
+from datetime import date
+
+import diagnostics
+
+DAY_NAMES = ["Пн","Вт","Ср","Чт","Пт","Сб","Вс"]
+
+STATUS_COLORS = {
+    "completed": "#d1fae5",   # зелёный
+    "in progress": "#fde68a", # оранжевый
+    "postponed": "#fecaca",   # красный
+    "pending": "#f3f4f6"      # серый
+}
+
+# Теги привязок: одна привязка на все ярлыки задач/ячейки вместо замыкания на каждый виджет
+TASK_TAG = "MonthGridTask"
+CELL_TAG = "MonthGridCell"
+
+WEEKS = 6
+
+
+class _Cell:
+    def __init__(self, parent, row, column):
+        self.frame = tk.Frame(parent, bg="white", bd=1, relief="solid")
+        self.frame.grid(row=row, column=column, padx=2, pady=2, sticky="nsew")
+        self.hdr = tk.Frame(self.frame, bg="#e5e7eb")
+        self.day_label = tk.Label(self.hdr, bg="#e5e7eb", fg="#111827")
+        self.day_label.pack(side="left", padx=4)
+        self.body = tk.Frame(self.frame, bg="white")
+        self.labels = []  # пул ярлыков задач, лишние скрыты
+        self.shown = 0
+        self.signature = None
+        self.date = None
+        for w in (self.frame, self.hdr, self.day_label, self.body):
+            w.bindtags((CELL_TAG,) + w.bindtags())
+
+
+class MonthGrid:
+    # Постоянная сетка 6×7: ячейки и ярлыки задач создаются один раз и
+    # перенастраиваются на месте; перерисовываются только изменившиеся ячейки
+    def __init__(self, parent, on_day, on_task, on_task_menu):
+        self.parent = parent
+        self.on_day = on_day
+        self.on_task = on_task
+        self.on_task_menu = on_task_menu
+        self._tasks = {}  # имя виджета-ярлыка -> (задача, дата)
+        self._cells_by_widget = {}
+        self.headers = []
+        for i, d in enumerate(DAY_NAMES):
+            lbl = tk.Label(parent, text=d, font=("Arial", 10, "bold"))
+            lbl.grid(row=0, column=i, padx=4, pady=4)
+            self.headers.append(lbl)
+            parent.grid_columnconfigure(i, weight=1)
+        self.cells = []
+        for r in range(1, WEEKS + 1):
+            row = []
+            for c in range(7):
+                cell = _Cell(parent, r, c)
+                for w in (cell.frame, cell.hdr, cell.day_label, cell.body):
+                    self._cells_by_widget[str(w)] = cell
+                row.append(cell)
+            self.cells.append(row)
+            parent.grid_rowconfigure(r, weight=1)
+        parent.bind_class(TASK_TAG, "<Button-1>", self._on_task_click)
+        parent.bind_class(TASK_TAG, "<Button-3>", self._on_task_menu)
+        parent.bind_class(CELL_TAG, "<Button-1>", self._on_cell_click)
+        self._colors = None
+
+    def invalidate(self):
+        # Следующий render перерисует все ячейки (например, после смены темы)
+        for row in self.cells:
+            for cell in row:
+                cell.signature = None
+        self._colors = None
+
+    @diagnostics.timed("month_grid.render")
+    def render(self, year, month, tasks_by_date, bg, fg, accent):
+        if self._colors != (bg, fg):
+            self._colors = (bg, fg)
+            self.parent.configure(bg=bg)
+            for lbl in self.headers:
+                lbl.configure(bg=bg, fg=fg)
+
+        weeks = pycalendar.Calendar(firstweekday=0).monthdayscalendar(year, month)
+        today = date.today()
+        for r, row in enumerate(self.cells):
+            if r >= len(weeks):
+                for cell in row:
+                    if cell.signature != "hidden":
+                        cell.frame.grid_remove()
+                        cell.signature = "hidden"
+                continue
+            for c, cell in enumerate(row):
+                day = weeks[r][c]
+                if day == 0:
+                    self._render_cell(cell, None, (), False, accent)
+                    continue
+                d_str = f"{year:04d}-{month:02d}-{day:02d}"
+                is_today = today.year == year and today.month == month and today.day == day
+                self._render_cell(cell, d_str, tasks_by_date.get(d_str, ()), is_today, accent)
+
+    def _render_cell(self, cell, d_str, tasks, is_today, accent):
+        signature = (d_str, is_today, accent, tuple((t.id, t.title, t.status) for t in tasks))
+        if cell.signature == signature:
+            # содержимое не изменилось, но задачи могли обновиться (описание и т.п.)
+            for lbl, task in zip(cell.labels, tasks):
+                self._tasks[str(lbl)] = (task, d_str)
+            return
+        if cell.signature == "hidden":
+            cell.frame.grid()
+        cell.signature = signature
+        cell.date = d_str
+
+        if d_str is None:
+            cell.frame.config(bg="white")
+            cell.hdr.pack_forget()
+            cell.body.pack_forget()
+            self._show_labels(cell, (), d_str)
+            return
+
+        head_bg = accent if is_today else "#e5e7eb"
+        cell.frame.config(bg=accent if is_today else "white")
+        cell.hdr.config(bg=head_bg)
+        cell.body.config(bg="white")
+        cell.day_label.config(text=str(int(d_str[8:])), bg=head_bg,
+                              fg="white" if is_today else "#111827")
+        if not cell.hdr.winfo_manager():
+            cell.hdr.pack(fill="x")
+            cell.body.pack(fill="both", expand=True)
+        self._show_labels(cell, tasks, d_str)
+
+    def _show_labels(self, cell, tasks, d_str):
+        while len(cell.labels) < len(tasks):
+            lbl = tk.Label(cell.body, anchor="w")
+            lbl.bindtags((TASK_TAG,) + lbl.bindtags())
+            cell.labels.append(lbl)
+        for i, task in enumerate(tasks):
+            lbl = cell.labels[i]
+            lbl.config(text=task.title, bg=STATUS_COLORS.get(task.status, "#f3f4f6"), fg="black")
+            if i >= cell.shown:
+                lbl.pack(fill="x", padx=4, pady=2)
+            self._tasks[str(lbl)] = (task, d_str)
+        for lbl in cell.labels[len(tasks):cell.shown]:
+            lbl.pack_forget()
+            self._tasks.pop(str(lbl), None)
+        cell.shown = len(tasks)
+
+    # ====== Делегированные обработчики ======
+    def _on_task_click(self, event):
+        entry = self._tasks.get(str(event.widget))
+        if entry:
+            self.on_task(entry[0], entry[1])
+        return "break"
+
+    def _on_task_menu(self, event):
+        entry = self._tasks.get(str(event.widget))
+        if entry:
+            self.on_task_menu(event, entry[0].id, entry[1])
+        return "break"
+
+    def _on_cell_click(self, event):
+        cell = self._cells_by_widget.get(str(event.widget))
+        if cell and cell.date:
+            self.on_day(cell.date)
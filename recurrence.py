@@ -0,0 +1,259 @@
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+
+# Правило повторения хранится в tasks.recurrence в форме RRULE (RFC 5545):
+#   FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR;UNTIL=20271231
+# Поддерживаются FREQ (DAILY/WEEKLY/MONTHLY/YEARLY), INTERVAL, BYDAY (для WEEKLY),
+# BYMONTHDAY (для MONTHLY, отрицательные — с конца месяца), COUNT и UNTIL.
+# Первое повторение — дедлайн задачи (DTSTART). Повторения не хранятся в БД:
+# они вычисляются для нужного окна дат, начиная сразу с периода, задевающего окно
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+# Короткие имена, которые можно писать вместо правила (интерфейс, импорт)
+PRESETS = {
+    "daily": "FREQ=DAILY",
+    "weekdays": "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR",
+    "weekly": "FREQ=WEEKLY",
+    "monthly": "FREQ=MONTHLY",
+    "yearly": "FREQ=YEARLY",
+}
+PRESET_DISPLAY = {"daily": "Каждый день", "weekdays": "По будням", "weekly": "Каждую неделю",
+                  "monthly": "Каждый месяц", "yearly": "Каждый год"}
+
+WEEKDAY_DISPLAY = ("пн", "вт", "ср", "чт", "пт", "сб", "вс")
+FREQ_DISPLAY = {"DAILY": ("каждый день", "дн."), "WEEKLY": ("каждую неделю", "нед."),
+                "MONTHLY": ("каждый месяц", "мес."), "YEARLY": ("каждый год", "г.")}
+
+# Сколько пустых периодов подряд допускается (BYMONTHDAY=31 в коротких месяцах и т.п.),
+# прежде чем правило считается исчерпанным
+MAX_EMPTY_PERIODS = 120
+
+
+def _parse_until(value):
+    value = value.split("T")[0].replace("-", "")
+    if len(value) != 8 or not value.isdigit():
+        raise ValueError(f"неверная дата UNTIL «{value}»")
+    return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+
+
+class Rule:
+    __slots__ = ("freq", "interval", "byday", "bymonthday", "count", "until")
+
+    def __init__(self, freq, interval=1, byday=(), bymonthday=(), count=None, until=None):
+        if freq not in FREQUENCIES:
+            raise ValueError(f"неизвестная частота «{freq}»")
+        if interval < 1:
+            raise ValueError("INTERVAL должен быть положительным")
+        if count is not None and count < 1:
+            raise ValueError("COUNT должен быть положительным")
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(set(byday)))
+        self.bymonthday = tuple(bymonthday)
+        self.count = count
+        self.until = until
+
+    def to_rrule(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[d] for d in self.byday))
+        if self.bymonthday:
+            parts.append("BYMONTHDAY=" + ",".join(str(d) for d in self.bymonthday))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%d')}")
+        return ";".join(parts)
+
+    def describe(self):
+        every, unit = FREQ_DISPLAY[self.freq]
+        text = every if self.interval == 1 else f"раз в {self.interval} {unit}"
+        if self.byday:
+            text += ": " + ", ".join(WEEKDAY_DISPLAY[d] for d in self.byday)
+        if self.bymonthday:
+            text += ", числа: " + ", ".join(str(d) for d in self.bymonthday)
+        if self.count is not None:
+            text += f", {self.count} раз"
+        if self.until is not None:
+            text += f", до {self.until.isoformat()}"
+        return text
+
+    # ====== Периоды ======
+    # Период — день, неделя, месяц или год с номером p от DTSTART (с учётом INTERVAL).
+    # Для окна дат номер первого нужного периода считается арифметически
+    def _first_period(self, dtstart, day):
+        n = self.interval
+        if self.freq == "DAILY":
+            return max(0, (day - dtstart).days // n)
+        if self.freq == "WEEKLY":
+            week0 = dtstart - timedelta(days=dtstart.weekday())
+            return max(0, (day - week0).days // (7 * n))
+        if self.freq == "MONTHLY":
+            months = (day.year - dtstart.year) * 12 + day.month - dtstart.month
+            return max(0, months // n)
+        return max(0, (day.year - dtstart.year) // n)
+
+    def _period(self, dtstart, p):
+        # (первый день периода, отсортированные даты повторений в нём)
+        n = self.interval
+        if self.freq == "DAILY":
+            day = dtstart + timedelta(days=p * n)
+            return day, [day]
+        if self.freq == "WEEKLY":
+            week = dtstart - timedelta(days=dtstart.weekday()) + timedelta(days=7 * n * p)
+            return week, [week + timedelta(days=d) for d in self.byday or (dtstart.weekday(),)]
+        if self.freq == "MONTHLY":
+            index = dtstart.year * 12 + dtstart.month - 1 + n * p
+            year, month = divmod(index, 12)
+            month += 1
+            first = date(year, month, 1)
+            days_in_month = calendar.monthrange(year, month)[1]
+            days = []
+            for d in self.bymonthday or (dtstart.day,):
+                if d < 0:
+                    d = days_in_month + d + 1
+                if 1 <= d <= days_in_month:
+                    days.append(first.replace(day=d))
+            return first, sorted(set(days))
+        year = dtstart.year + n * p
+        first = date(year, 1, 1)
+        try:
+            return first, [date(year, dtstart.month, dtstart.day)]
+        except ValueError:
+            return first, []  # 29 февраля в невисокосный год
+
+    def _walk(self, dtstart, p):
+        # Даты повторений (не раньше DTSTART), начиная с периода p
+        empty = 0
+        while empty < MAX_EMPTY_PERIODS:
+            first, days = self._period(dtstart, p)
+            found = False
+            for d in days:
+                if d >= dtstart:
+                    found = True
+                    yield d
+            empty = 0 if found else empty + 1
+            p += 1
+            if self.until is not None and first > self.until:
+                return
+
+    def _regular(self, dtstart):
+        # В каждом периоде одинаковое число повторений — тогда COUNT считается арифметически.
+        # Не так у дней месяца, которых бывает нет (31, -29..-31, 29 февраля)
+        if self.freq == "MONTHLY":
+            days = self.bymonthday or (dtstart.day,)
+            return all(1 <= d <= 28 for d in days) or all(-28 <= d <= -1 for d in days)
+        if self.freq == "YEARLY":
+            return (dtstart.month, dtstart.day) != (2, 29)
+        return True
+
+    def last_date(self, dtstart):
+        # Последнее повторение с учётом UNTIL и COUNT; None — правило бесконечно
+        if self.count is None:
+            return self.until
+        last = _count_end(self.to_rrule(), dtstart)
+        if self.until is not None and self.until < last:
+            return self.until
+        return last
+
+    def dates(self, dtstart, start, end):
+        # Повторения в окне [start, end]. Стоимость — число периодов, задевающих окно,
+        # а не длительность правила
+        last = self.last_date(dtstart)
+        if last is not None and last < end:
+            end = last
+        if start < dtstart:
+            start = dtstart
+        if start > end:
+            return
+        for d in self._walk(dtstart, self._first_period(dtstart, start)):
+            if d > end:
+                return
+            if d >= start:
+                yield d
+
+
+@lru_cache(maxsize=4096)
+def _count_end(text, dtstart):
+    # Дата COUNT-го повторения; кэш — по строке правила и DTSTART.
+    # В первом периоде повторения раньше DTSTART не считаются, дальше в каждом
+    # периоде их поровну — номер последнего периода находится делением
+    rule = parse_rule(text)
+    if rule._regular(dtstart):
+        first = [d for d in rule._period(dtstart, 0)[1] if d >= dtstart]
+        if rule.count <= len(first):
+            return first[rule.count - 1]
+        per_period = len(rule._period(dtstart, 1)[1])
+        p, i = divmod(rule.count - len(first) - 1, per_period)
+        return rule._period(dtstart, p + 1)[1][i]
+    # дни, которых нет в части месяцев: периоды без повторений заранее не сосчитать
+    last = None
+    for i, d in enumerate(rule._walk(dtstart, 0), 1):
+        if rule.until is not None and d > rule.until:
+            break
+        last = d
+        if i >= rule.count:
+            break
+    return last if last is not None else dtstart - timedelta(days=1)
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(text):
+    # Правило из строки RRULE или короткого имени; ValueError, если разобрать нельзя.
+    # Одинаковые строки дают один и тот же объект Rule
+    text = (text or "").strip()
+    if not text:
+        raise ValueError("пустое правило повторения")
+    text = PRESETS.get(text.lower(), text)
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    fields = {}
+    for part in text.split(";"):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"неверная часть правила «{part}»")
+        fields[key.strip().upper()] = value.strip().upper()
+    try:
+        freq = fields.pop("FREQ")
+        interval = int(fields.pop("INTERVAL", 1))
+        byday = [WEEKDAYS.index(d.strip()[-2:]) for d in fields.pop("BYDAY", "").split(",") if d.strip()]
+        bymonthday = [int(d) for d in fields.pop("BYMONTHDAY", "").split(",") if d.strip()]
+        count = int(fields.pop("COUNT")) if "COUNT" in fields else None
+        until = _parse_until(fields.pop("UNTIL")) if "UNTIL" in fields else None
+    except KeyError:
+        raise ValueError("в правиле нет FREQ") from None
+    if fields:
+        raise ValueError("неподдерживаемые части правила: " + ", ".join(sorted(fields)))
+    if byday and freq != "WEEKLY":
+        raise ValueError("BYDAY поддерживается только для FREQ=WEEKLY")
+    if bymonthday and freq != "MONTHLY":
+        raise ValueError("BYMONTHDAY поддерживается только для FREQ=MONTHLY")
+    if any(d == 0 or not -31 <= d <= 31 for d in bymonthday):
+        raise ValueError("BYMONTHDAY должен быть от 1 до 31 или от -31 до -1")
+    return Rule(freq, interval, byday, bymonthday, count, until)
+
+
+def rule_for(task):
+    # Правило задачи или None, если задача не повторяется (нет правила, дедлайна,
+    # правило битое или дедлайн не в формате YYYY-MM-DD — от него отсчитываются повторения)
+    if not task.recurrence or not task.deadline:
+        return None
+    try:
+        date.fromisoformat(task.deadline)
+        return parse_rule(task.recurrence)
+    except ValueError:
+        return None
+
+
+def describe(text):
+    try:
+        rule = parse_rule(text)
+    except ValueError:
+        return text or ""
+    return PRESET_DISPLAY.get((text or "").strip().lower()) or rule.describe()
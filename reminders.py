@@ -0,0 +1,180 @@
+import heapq
+import time
+from datetime import datetime
+
+import database
+
+# Формат tasks.reminder: местное время с точностью до минуты
+REMINDER_FORMAT = "%Y-%m-%d %H:%M"
+# Самый долгий сон таймера: после сна компьютера или перевода часов срок пересчитается
+# не позже чем через час. Это единственные «лишние» пробуждения — 24 в сутки
+MAX_TIMER_MS = 60 * 60 * 1000
+# За какой срок (с) показываются напоминания, пропущенные, пока программа была закрыта
+MISSED_WINDOW = 24 * 60 * 60
+# Ключ настроек: до какого момента напоминания уже показаны
+CHECKED_KEY = "reminders_checked_until"
+
+
+# Что принимается на входе (ввод в окне, импорт); хранится всегда REMINDER_FORMAT
+INPUT_FORMATS = (REMINDER_FORMAT, "%Y-%m-%d %H:%M:%S", "%d.%m.%Y %H:%M")
+
+
+def _parse(value):
+    value = " ".join(value.replace("T", " ").split())
+    for fmt in INPUT_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"неверное время напоминания «{value}»")
+
+
+def parse_reminder(value):
+    # Время напоминания как метка time.time(); ValueError, если строка не разбирается
+    return _parse(value).timestamp()
+
+
+def normalize_reminder(value):
+    return _parse(value).strftime(REMINDER_FORMAT)
+
+
+def format_reminder(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime(REMINDER_FORMAT)
+
+
+class ReminderScheduler:
+    # Ближайшие напоминания лежат в min-heap (срок, id, строка reminder); взведён ровно
+    # один root.after — на срок вершины кучи. Изменения задач приходят событиями
+    # TaskStore и правят кучу точечно: новая запись добавляется, устаревшая остаётся
+    # в куче и отбрасывается при извлечении (сверка с self._due). Таблица не опрашивается
+    def __init__(self, root, store, on_fire, settings=None, clock=time.time):
+        self.root = root
+        self.store = store
+        self.on_fire = on_fire
+        self.settings = settings
+        self.clock = clock
+        self._heap = []
+        self._due = {}       # id задачи → актуальная строка reminder
+        self._fired = {}     # id задачи → уже показанная строка reminder
+        self._job = None
+        self._armed_for = None
+        self.loaded = False
+        store.subscribe(self._on_tasks_changed)
+
+    # ====== Загрузка ======
+    def _on_tasks_changed(self, kind, tasks):
+        if kind == "loaded":
+            self.load()
+            return
+        if not self.loaded:
+            return
+        for t in tasks:
+            if kind == "deleted":
+                self._due.pop(t.id, None)
+                self._fired.pop(t.id, None)
+            elif t.id in self.store.tasks:
+                # Occurrence и задача с тем же id — берём актуальную задачу из хранилища
+                self._track(self.store.tasks[t.id])
+        self._arm()
+
+    def load(self):
+        # Индексированная выборка (idx_tasks_reminder) в потоке БД; пропущенные, пока
+        # программа была закрыта, — начиная с последней проверки, но не старше суток
+        now = self.clock()
+        since = now - MISSED_WINDOW
+        checked = self.settings.get(CHECKED_KEY) if self.settings is not None else None
+        if checked:
+            # напоминания минуты checked уже показаны
+            since = max(since, checked + 60)
+        else:
+            since = now
+        since_text = format_reminder(since)
+        if self.store.worker is None:
+            self._loaded(database.get_upcoming_reminders(since_text))
+        else:
+            self.store.worker.submit(database.get_upcoming_reminders, since_text,
+                                     key="reminders", on_done=self._loaded)
+
+    def _loaded(self, rows):
+        self._heap = []
+        self._due = {}
+        for task_id, reminder in rows:
+            try:
+                due = parse_reminder(reminder)
+            except (TypeError, ValueError):
+                continue
+            self._due[task_id] = reminder
+            self._heap.append((due, task_id, reminder))
+        heapq.heapify(self._heap)
+        self.loaded = True
+        self._arm(force=True)
+
+    def _track(self, t):
+        if not t.reminder or t.status == "completed":
+            self._due.pop(t.id, None)
+            return
+        if self._due.get(t.id) == t.reminder or self._fired.get(t.id) == t.reminder:
+            return
+        try:
+            due = parse_reminder(t.reminder)
+        except (TypeError, ValueError):
+            self._due.pop(t.id, None)
+            return
+        self._due[t.id] = t.reminder
+        heapq.heappush(self._heap, (due, t.id, t.reminder))
+
+    # ====== Таймер ======
+    def _top(self):
+        # Вершина кучи без устаревших записей
+        heap = self._heap
+        while heap and self._due.get(heap[0][1]) != heap[0][2]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _arm(self, force=False):
+        top = self._top()
+        if top is None:
+            self._cancel()
+            return
+        if not force and self._job is not None and self._armed_for is not None and self._armed_for <= top[0]:
+            return  # таймер уже взведён не позже нужного
+        self._cancel()
+        delay = min(MAX_TIMER_MS, max(0, int((top[0] - self.clock()) * 1000)))
+        self._armed_for = top[0]
+        self._job = self.root.after(delay, self._fire)
+
+    def _cancel(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+        self._job = None
+        self._armed_for = None
+
+    def _fire(self):
+        self._job = None
+        self._armed_for = None
+        now = self.clock()
+        due = []
+        while True:
+            top = self._top()
+            if top is None or top[0] > now:
+                break
+            heapq.heappop(self._heap)
+            self._due.pop(top[1], None)
+            self._fired[top[1]] = top[2]
+            task = self.store.tasks.get(top[1])
+            if task is not None:
+                due.append(task)
+        if due and self.settings is not None:
+            self.settings[CHECKED_KEY] = now
+        self._arm(force=True)
+        if due:
+            # одним вызовом: после сна компьютера сработавших может быть много
+            self.on_fire(due)
+
+    def pending(self):
+        # Сколько напоминаний ждёт срабатывания
+        return len(self._due)
+
+    def stop(self):
+        self._cancel()
+        self.store.unsubscribe(self._on_tasks_changed)
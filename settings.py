@@ -1,57 +1,257 @@
-import json
-import os
+import copy
+import threading
+import time
+from contextlib import contextmanager
 
-SETTINGS_FILE = 'settings.json'
+import database
 
 DEFAULT_SETTINGS = {
     "theme": "light",
     "app_password": "",
     "autostart_enabled": False,
-    "categories": ["Работа","Учеба","Личное","Здоровье","Финансы"]  # стандартные + пользовательские
 }
 
+# Как часто (с) поток БД проверяет, не изменил ли настройки второй экземпляр
+CHECK_INTERVAL = 2.0
+
+
+def _read(version):
+    # В потоке БД. data_version соединения меняют только чужие коммиты; записи
+    # этого потока (задачи, свои же настройки) её не трогают — перечитывать нечего
+    current = database.data_version()[0]
+    if current == version:
+        return current, None
+    data = copy.deepcopy(DEFAULT_SETTINGS)
+    data.update(database.get_settings())
+    return current, (data, database.get_categories())
+
+
+class Settings:
+    # Настройки из таблицы settings и список категорий из таблицы categories.
+    # Значения кэшируются в памяти и перечитываются, только если БД изменил кто-то
+    # другой — по PRAGMA data_version. Изменения копятся и пишутся одной
+    # транзакцией — сразу или в конце batch().
+    # submit — как у db_worker.DatabaseWorker: тогда запись и проверка data_version
+    # идут в потоке БД, а чтение из потока Tk отдаёт кэш, не обращаясь к БД
+    def __init__(self, submit=None):
+        self.submit = submit
+        self._data = None
+        self._categories = None
+        self._version = None
+        self._changed = set()  # ключи, ещё не отправленные в БД
+        self._writes = 0       # записи, отправленные в поток БД и ещё не выполненные
+        self._batch_depth = 0
+        self._revision = 0     # растёт при каждом своём изменении
+        self._checking = False
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    # ====== Чтение ======
+    def _current(self):
+        with self._lock:
+            if self._changed or self._writes:
+                # свои несохранённые изменения важнее: перечитаем после записи
+                return self._data
+            if self.submit is None:
+                # без потока БД (экспорт) — прямо здесь; свои записи видны по total_changes
+                version = database.data_version()
+                if self._data is None or version != self._version:
+                    data = copy.deepcopy(DEFAULT_SETTINGS)
+                    data.update(database.get_settings())
+                    self._loaded(version, data, database.get_categories())
+            elif self._data is None:
+                version, loaded = self._read_now()
+                self._loaded(version, *loaded)
+            else:
+                self._check()
+            return self._data
+
+    def _read_now(self):
+        # Первое чтение с потоком БД — тоже в нём, вызывающий поток ждёт ответа.
+        # data_version у каждого соединения своя: сравнивать в _check можно только
+        # с версией того же соединения потока БД
+        ready = threading.Event()
+        box = []
+
+        def read():
+            try:
+                box.append(_read(None))
+            except Exception as e:
+                box.append(e)
+            finally:
+                ready.set()
+        self.submit(read)
+        ready.wait()
+        if isinstance(box[0], Exception):
+            raise box[0]
+        return box[0]
+
+    def _loaded(self, version, data, categories):
+        self._data = data
+        self._categories = categories
+        self._version = version
+
+    def _check(self):
+        # Не чаще CHECK_INTERVAL; ответ придёт позже, а пока отдаём кэш
+        now = time.monotonic()
+        if self._checking or now - self._checked_at < CHECK_INTERVAL:
+            return
+        self._checking = True
+        self._checked_at = now
+        revision = self._revision
+        self.submit(_read, self._version, key="settings",
+                    on_done=lambda result: self._checked(revision, *result),
+                    on_error=self._check_failed)
+
+    def _checked(self, revision, version, loaded):
+        with self._lock:
+            self._checking = False
+            if revision != self._revision or self._changed or self._writes:
+                # пока шла проверка, изменили сами — ответ устарел, проверим ещё раз
+                self._checked_at = 0.0
+            elif loaded is not None:
+                self._loaded(version, *loaded)
+            else:
+                self._version = version
+
+    def _check_failed(self, exc):
+        with self._lock:
+            self._checking = False
+        raise exc
+
+    def attach(self, submit):
+        # Подключение потока БД к уже прочитанным настройкам: версия, прочитанная
+        # в этом потоке, для соединения потока БД ничего не значит — перечитаем там
+        with self._lock:
+            self.submit = submit
+            if not self._changed and not self._writes:
+                self._data = None
+
+    def get(self, key, default=None):
+        with self._lock:
+            return copy.deepcopy(self._current().get(key, default))
+
+    def __getitem__(self, key):
+        with self._lock:
+            return copy.deepcopy(self._current()[key])
+
+    def as_dict(self):
+        with self._lock:
+            return copy.deepcopy(self._current())
+
+    def categories(self):
+        with self._lock:
+            self._current()
+            return list(self._categories)
+
+    # ====== Запись ======
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def update(self, changes):
+        with self._lock:
+            data = self._current()
+            for key, value in changes.items():
+                if data.get(key) != value:
+                    data[key] = copy.deepcopy(value)
+                    self._changed.add(key)
+                    self._revision += 1
+            self._schedule()
+
+    @contextmanager
+    def batch(self):
+        # Все изменения внутри блока — одна транзакция на выходе
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                self._schedule()
+
+    def _schedule(self):
+        if not self._batch_depth and self._changed:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._changed:
+                return
+            changes = {key: copy.deepcopy(self._data[key]) for key in self._changed}
+            self._changed.clear()
+            self._write(database.save_settings, changes)
+
+    def _write(self, fn, *args):
+        if self.submit is None:
+            fn(*args)
+            return
+        self._writes += 1
+        self._revision += 1
+        self.submit(fn, *args, on_done=self._written, on_error=self._write_failed)
+
+    def _written(self, result=None):
+        with self._lock:
+            self._writes -= 1
+
+    def _write_failed(self, exc):
+        # кэш мог разойтись с БД — при следующем чтении берём состояние из БД
+        with self._lock:
+            self._writes -= 1
+            self._version = None
+            self._checked_at = 0.0
+        raise exc
+
+    # ====== Категории ======
+    def add_category(self, name):
+        name = name.strip()
+        with self._lock:
+            self._current()
+            if name and name not in self._categories:
+                self._categories.append(name)
+                self._write(database.add_category, name)
+
+    def remove_category(self, name):
+        with self._lock:
+            self._current()
+            if name in self._categories:
+                self._categories.remove(name)
+                self._write(database.remove_category, name)
+
+
+_settings = None
+
+
+def get_settings(submit=None):
+    # Общий экземпляр на процесс; submit задаётся, когда появляется поток БД
+    global _settings
+    if _settings is None:
+        _settings = Settings(submit)
+    elif submit is not None and submit != _settings.submit:
+        _settings.attach(submit)
+    return _settings
+
 def load_settings():
-    if not os.path.exists(SETTINGS_FILE):
-        save_settings(DEFAULT_SETTINGS)
-        return DEFAULT_SETTINGS.copy()
-    try:
-        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        for k, v in DEFAULT_SETTINGS.items():
-            data.setdefault(k, v)
-        return data
-    except Exception:
-        return DEFAULT_SETTINGS.copy()
+    data = get_settings().as_dict()
+    data["categories"] = get_settings().categories()
+    return data
 
 def save_settings(settings):
-    with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(settings, f, ensure_ascii=False, indent=2)
+    settings = dict(settings)
+    settings.pop("categories", None)
+    get_settings().update(settings)
 
 def set_theme(theme):
-    s = load_settings()
-    s['theme'] = theme
-    save_settings(s)
+    get_settings()['theme'] = theme
 
 def set_password(password):
-    s = load_settings()
-    s['app_password'] = password or ""
-    save_settings(s)
+    get_settings()['app_password'] = password or ""
 
 def set_autostart(enabled):
-    s = load_settings()
-    s['autostart_enabled'] = bool(enabled)
-    save_settings(s)
+    get_settings()['autostart_enabled'] = bool(enabled)
 
 def add_category(name):
-    s = load_settings()
-    name = name.strip()
-    if name and name not in s['categories']:
-        s['categories'].append(name)
-        save_settings(s)
+    get_settings().add_category(name)
 
 def remove_category(name):
-    s = load_settings()
-    if name in s['categories']:
-        s['categories'].remove(name)
-        save_settings(s)
-
+    get_settings().remove_category(name)
@@ -0,0 +1,484 @@
+import bisect
+import re
+import unicodedata
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+import database
+import recurrence
+from models import Occurrence, Task, split_tags
+
+PRIORITY_RANK = {'high': 1, 'medium': 2, 'low': 3}
+
+
+def _nulls_first(value):
+    # как в SQLite: NULL при сортировке по возрастанию идёт первым
+    return (value is not None, value or "")
+
+
+# Сортировки в памяти, повторяющие database.TASK_ORDERS.
+# Ключи применяются по очереди стабильной сортировкой, последний — главный
+# При равных created_at более новая (с большим id) задача идёт первой
+def _newest(t):
+    return (t.created_at or "", t.id)
+
+
+def _by_id(t):
+    return t.id
+
+
+ORDERS = {
+    'priority': [(_newest, True), (lambda t: PRIORITY_RANK.get(t.priority, 4), False)],
+    'created': [(_newest, True)],
+    'deadline': [(_newest, True), (lambda t: _nulls_first(t.deadline), False)],
+    'id': [(_by_id, False)],
+    'title': [(_by_id, False), (lambda t: t.title, False)],
+    'category': [(_by_id, False), (lambda t: _nulls_first(t.category), False)],
+    'status': [(_by_id, False), (lambda t: _nulls_first(t.status), False)],
+    'created_at': [(_by_id, False), (lambda t: t.created_at or "", False)],
+}
+
+
+class _Desc:
+    # Часть составного ключа в обратном порядке (для ключей с reverse=True)
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def _sort_key(order):
+    # Один ключ, дающий тот же порядок, что и цепочка сортировок ORDERS[order]:
+    # главный ключ — первым. Нужен для поиска места строки двоичным поиском
+    parts = list(reversed(ORDERS[order]))
+
+    def key(t):
+        return tuple(_Desc(k(t)) if reverse else k(t) for k, reverse in parts)
+    return key
+
+
+SORT_KEYS = {order: _sort_key(order) for order in ORDERS}
+# Изменённых строк больше этого — кэш сортировок проще пересобрать целиком,
+# чем переставлять строки по одной (каждая вставка сдвигает хвост списка)
+RESORT_LIMIT = 200
+
+
+# ====== Поиск ======
+# Слова так, как их режет tasks_fts (tokenize='unicode61 remove_diacritics 2'):
+# буквы и цифры, у латиницы снимаются диакритики, кириллица (ё, й) остаётся как есть
+_SEPARATOR_RE = re.compile(r"[\W_]+")
+_LATIN_RE = re.compile("[\u00c0-\u017e]")
+_LATIN_FOLD = {cp: "".join(c for c in unicodedata.normalize("NFD", chr(cp)) if not unicodedata.combining(c))
+               for cp in range(0xC0, 0x17F)}
+# Символы, на которых свёртка выше сверена с SQLite; с остальными (эмодзи, ₽,
+# комбинируемые диакритики) сужать в памяти нельзя — только поиск в БД
+_EXACT_RE = re.compile("[\x00-\u00b4\u00b6-\u012f\u0131-\u017e\u0400-\u04ff\u2000-\u2064\u2100-\u2189]*")
+
+
+def _fold(text):
+    text = text.lower()
+    if not _EXACT_RE.fullmatch(text):
+        return None
+    if _LATIN_RE.search(text):
+        text = text.translate(_LATIN_FOLD)
+    return text
+
+
+def _search_text(t):
+    # " слово слово ..." полей tasks_fts: префикс слова ищется как " " + префикс.
+    # None — если в тексте есть символы, которые SQLite может разбить иначе
+    text = _fold(" ".join(v for v in (t.title, t.description, t.category, t.tags) if v))
+    if text is None:
+        return None
+    return _SEPARATOR_RE.sub(" ", " " + text)
+
+
+def _prefixes(keyword):
+    # " префикс" на каждое слово запроса. None, если слово SQLite режет не на одно
+    # слово: "e-mail" — фраза, а "№" без букв не находит ничего, и дописанный
+    # к нему запрос уже не сужает прошлый результат
+    prefixes = []
+    for word in keyword.split():
+        word = _fold(word)
+        tokens = [w for w in _SEPARATOR_RE.split(word) if w] if word is not None else []
+        if len(tokens) != 1:
+            return None
+        prefixes.append(" " + tokens[0])
+    return prefixes or None
+
+
+def _load_all():
+    # Задачи и переопределённые повторения — одним запросом к потоку БД.
+    # Текст для поиска тоже считается здесь, а не в потоке Tk
+    tasks = database.get_all_tasks()
+    return tasks, database.get_occurrence_overrides(), {t.id: _search_text(t) for t in tasks}
+
+
+class TaskStore:
+    # Единственный источник задач для представлений: загружается из БД один раз,
+    # держит задачи в памяти с индексами по id, дате, статусу, категории и тегам.
+    # Каждая запись идёт в БД одной транзакцией, после чего подписчики получают
+    # событие (kind, tasks): kind — "loaded", "added", "updated" или "deleted",
+    # tasks — затронутые задачи (для "deleted" — в последнем известном виде).
+    # С worker (db_worker.DatabaseWorker) обращения к БД уходят в фоновый поток:
+    # изменения статуса и удаления применяются в памяти сразу, добавленные задачи
+    # и загрузка приходят событием после ответа БД. Если запись не удалась,
+    # хранилище перечитывается из БД, а ошибка передаётся в on_error
+    def __init__(self, worker=None, on_error=None):
+        self.worker = worker
+        self.on_error = on_error
+        self.tasks = {}
+        self.by_date = {}
+        self.by_status = {}
+        self.by_category = {}
+        self.by_tag = {}      # нормализованный тег → id задач
+        self.recurring = {}   # id → (правило, дата первого повторения)
+        self.overrides = {}   # id → {дата: статус} для отдельных повторений
+        self._search_texts = {}  # id → _search_text(); после изменения задачи считается заново
+        self._sorted = {}
+        self._resort = []     # (старая, новая) задача, ещё не переставленные в _sorted
+        self._listeners = []
+        self.loaded = False
+        self._batch_depth = 0
+        self._pending = {}
+
+    def _call(self, fn, args, on_done=None, key=None):
+        # Без worker — синхронно (скрипты, бенчмарки); с worker — в потоке БД
+        if self.worker is None:
+            result = fn(*args)
+            if on_done is not None:
+                on_done(result)
+            return result
+        self.worker.submit(fn, *args, key=key, on_done=on_done, on_error=self._write_failed)
+
+    def _write_failed(self, exc):
+        # память могла разойтись с БД — берём состояние с диска
+        self.load()
+        if self.on_error is None:
+            raise exc
+        self.on_error(exc)
+
+    # ====== Подписки ======
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _publish(self, kind, tasks):
+        if self._batch_depth:
+            self._pending.setdefault(kind, []).extend(tasks)
+            return
+        for callback in list(self._listeners):
+            callback(kind, tasks)
+
+    @contextmanager
+    def batch(self):
+        # Внутри блока события копятся и рассылаются одним пакетом на выходе
+        # (например, импорт из тысячи пачек обновляет представления один раз)
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                pending, self._pending = self._pending, {}
+                for kind, tasks in pending.items():
+                    self._publish(kind, tasks)
+
+    # ====== Индексы ======
+    def _index(self, t):
+        self.tasks[t.id] = t
+        self._changed(None, t)
+        rule = recurrence.rule_for(t)
+        if rule is not None:
+            self.recurring[t.id] = (rule, date.fromisoformat(t.deadline))
+        if t.deadline:
+            self.by_date.setdefault(t.deadline, set()).add(t.id)
+        self.by_status.setdefault(t.status, set()).add(t.id)
+        self.by_category.setdefault(t.category or "", set()).add(t.id)
+        for tag in split_tags(t.tags):
+            self.by_tag.setdefault(tag, set()).add(t.id)
+
+    def _unindex(self, t):
+        self.tasks.pop(t.id, None)
+        self._search_texts.pop(t.id, None)
+        self._changed(t, None)
+        self.recurring.pop(t.id, None)
+        keys = [(self.by_date, t.deadline), (self.by_status, t.status),
+                (self.by_category, t.category or "")]
+        keys.extend((self.by_tag, tag) for tag in split_tags(t.tags))
+        for index, key in keys:
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(t.id)
+                if not ids:
+                    del index[key]
+
+    def load(self):
+        # Повторные запросы загрузки, пока первый не начался, схлопываются в один
+        self._call(_load_all, (), self._loaded, key="load")
+
+    def _loaded(self, result):
+        tasks, self.overrides, self._search_texts = result
+        self._sorted.clear()
+        self._resort.clear()
+        self.tasks.clear()
+        self.by_date.clear()
+        self.by_status.clear()
+        self.by_category.clear()
+        self.by_tag.clear()
+        self.recurring.clear()
+        for t in tasks:
+            self._index(t)
+        self.loaded = True
+        self._publish("loaded", list(self.tasks.values()))
+
+    # ====== Чтение ======
+    def get(self, task_id):
+        t = self.tasks.get(task_id)
+        if t is None and not self.loaded and self.worker is None:
+            # хранилище ещё не загружено — точечный запрос по первичному ключу
+            t = database.get_task(task_id)
+        return t
+
+    def get_many(self, task_ids):
+        result = [self.tasks[tid] for tid in task_ids if tid in self.tasks]
+        if len(result) < len(task_ids) and not self.loaded and self.worker is None:
+            result = database.get_tasks(task_ids)
+        return result
+
+    def in_range(self, start_date, end_date):
+        # Задачи с дедлайном в окне дат; повторяющиеся задачи — отдельными Occurrence
+        # на каждый день повторения. Стоимость — число дней окна и видимых повторений,
+        # а не размер таблицы и не длительность правил
+        by_day = {}
+        first = day = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        while day <= end:
+            ids = self.by_date.get(day.isoformat())
+            if ids:
+                tasks = [self.tasks[i] for i in ids if i not in self.recurring]
+                if tasks:
+                    by_day[day] = tasks
+            day += timedelta(days=1)
+        for task_id, (rule, dtstart) in self.recurring.items():
+            t = self.tasks[task_id]
+            overrides = self.overrides.get(task_id, {})
+            for d in rule.dates(dtstart, first, end):
+                d_str = d.isoformat()
+                by_day.setdefault(d, []).append(Occurrence(t, d_str, overrides.get(d_str)))
+        result = []
+        for d in sorted(by_day):
+            tasks = by_day[d]
+            tasks.sort(key=_newest, reverse=True)
+            result.extend(tasks)
+        return result
+
+    def is_recurring(self, task_id):
+        return task_id in self.recurring
+
+    def _changed(self, old, new):
+        # Отсортированные списки правятся при следующем чтении, а не на каждое событие
+        if not self._sorted:
+            return
+        self._resort.append((old, new))
+        if len(self._resort) > RESORT_LIMIT:
+            self._sorted.clear()
+            self._resort.clear()
+
+    def _apply_resort(self):
+        # Переставляем только изменённые строки: место ищется двоичным поиском
+        changes, self._resort = self._resort, []
+        for order, rows in self._sorted.items():
+            key = SORT_KEYS[order]
+            for old, new in changes:
+                if old is not None:
+                    i = bisect.bisect_left(rows, key(old), key=key)
+                    if i < len(rows) and rows[i] is old:
+                        del rows[i]
+                if new is not None:
+                    bisect.insort(rows, new, key=key)
+
+    def _ordered(self, order):
+        if self._resort:
+            self._apply_resort()
+        rows = self._sorted.get(order)
+        if rows is None:
+            rows = list(self.tasks.values())
+            for key, reverse in ORDERS[order]:
+                rows.sort(key=key, reverse=reverse)
+            self._sorted[order] = rows
+        return rows
+
+    def narrow(self, task_ids, keyword, previous):
+        # id из task_ids (в том же порядке), которые нашёл бы database.search_task_ids(keyword),
+        # если task_ids — ответ на запрос previous, а keyword его дописывает: каждое слово
+        # запроса — префикс какого-либо слова задачи. None — повторить SQLite в памяти нельзя
+        prefixes = _prefixes(keyword)
+        if (prefixes is None or not keyword.startswith(previous) or _prefixes(previous) is None
+                or not database.has_fts()):
+            return None
+        texts = self._search_texts
+        for task_id in [i for i in task_ids if i not in texts]:
+            t = self.tasks.get(task_id)
+            if t is None:
+                return None
+            texts[task_id] = _search_text(t)
+        try:
+            if len(prefixes) == 1:
+                prefix = prefixes[0]
+                return [i for i in task_ids if prefix in texts[i]]
+            return [i for i in task_ids if all(p in texts[i] for p in prefixes)]
+        except TypeError:
+            # текст одной из задач (None) с SQLite не сверить
+            return None
+
+    def tags(self):
+        # Все теги задач по алфавиту (для фильтра списка)
+        return sorted(self.by_tag)
+
+    def _with_tags(self, tags, tags_mode):
+        # id задач с тегами: пересечение ('all') или объединение ('any') множеств by_tag
+        if tags_mode not in database.TAG_MODES:
+            raise ValueError(f"неизвестный режим фильтра тегов: {tags_mode}")
+        sets = [self.by_tag.get(tag, set()) for tag in split_tags(tags)]
+        if not sets:
+            return None
+        if tags_mode == 'any':
+            return set().union(*sets)
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def query(self, status=None, category=None, keyword=None, order='priority', matches=None,
+              tags=None, tags_mode='all'):
+        # Те же фильтры, что у database.query_tasks; ключевое слово ищется через FTS-индекс.
+        # matches — уже полученный database.search_task_ids(keyword), чтобы не ходить в БД
+        candidates = self._with_tags(tags, tags_mode)
+        if status:
+            ids = self.by_status.get(status, set())
+            candidates = ids if candidates is None else candidates & ids
+        if category:
+            ids = self.by_category.get(category, set())
+            candidates = ids if candidates is None else candidates & ids
+        if keyword and keyword.split():
+            found = database.search_task_ids(keyword) if matches is None else matches
+            if order == 'rank':
+                return [self.tasks[i] for i in found
+                        if i in self.tasks and (candidates is None or i in candidates)]
+            found = set(found)
+            candidates = found if candidates is None else candidates & found
+        if order == 'rank':
+            order = 'priority'
+        rows = self._ordered(order)
+        if candidates is None:
+            return list(rows)
+        return [t for t in rows if t.id in candidates]
+
+    # ====== Запись ======
+    @staticmethod
+    def insert(tasks_data):
+        # Вставка в БД и сборка Task; хранилище не трогает, поэтому годится для потока БД.
+        # created_at задаём сами (UTC, как CURRENT_TIMESTAMP), чтобы не перечитывать строки
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        prepared = []
+        for data in tasks_data:
+            data = dict(data)
+            data.setdefault('created_at', created_at)
+            prepared.append(data)
+        ids = database.add_tasks(prepared)
+        return [Task(task_id, data['title'], data.get('description', ''), data['created_at'],
+                     data.get('deadline'), data.get('priority', 'medium'), data.get('category', ''),
+                     data.get('status', 'pending'), data.get('tags', ''), data.get('recurrence'),
+                     data.get('reminder'))
+                for task_id, data in zip(ids, prepared)]
+
+    def apply_added(self, tasks):
+        # Задачи, уже записанные через insert(), попадают в индексы и рассылаются подписчикам
+        for t in tasks:
+            self._index(t)
+        if tasks:
+            self._publish("added", tasks)
+
+    def add_tasks(self, tasks_data, on_done=None):
+        # on_done(tasks) вызывается после записи; без worker задачи ещё и возвращаются
+        def added(tasks):
+            self.apply_added(tasks)
+            if on_done is not None:
+                on_done(tasks)
+            return tasks
+        if self.worker is None:
+            return added(self.insert(tasks_data))
+        self._call(self.insert, (list(tasks_data),), added)
+
+    def update_statuses(self, task_ids, new_status):
+        self._call(database.update_statuses, (list(task_ids), new_status))
+        updated = []
+        for task_id in task_ids:
+            old = self.tasks.get(task_id)
+            if old is None or old.status == new_status:
+                continue
+            self._unindex(old)
+            t = old.replace(status=new_status)
+            self._index(t)
+            updated.append(t)
+        if updated:
+            self._publish("updated", updated)
+
+    def set_reminders(self, task_ids, reminder):
+        # reminder — "YYYY-MM-DD HH:MM" (местное время) или None
+        self._call(database.update_reminders, (list(task_ids), reminder))
+        updated = []
+        for task_id in task_ids:
+            old = self.tasks.get(task_id)
+            if old is None or old.reminder == reminder:
+                continue
+            t = old.replace(reminder=reminder)
+            self._unindex(old)
+            self._index(t)
+            updated.append(t)
+        if updated:
+            self._publish("updated", updated)
+
+    def set_tags(self, task_ids, tags):
+        # tags — строка тегов в формате tasks.tags
+        self._call(database.update_tags, (list(task_ids), tags))
+        updated = []
+        for task_id in task_ids:
+            old = self.tasks.get(task_id)
+            if old is None or old.tags == tags:
+                continue
+            t = old.replace(tags=tags)
+            self._unindex(old)
+            self._index(t)
+            updated.append(t)
+        if updated:
+            self._publish("updated", updated)
+
+    def set_occurrence_status(self, task_id, day, new_status):
+        # Статус одного дня повторяющейся задачи; сама задача не меняется
+        t = self.tasks.get(task_id)
+        if t is None or task_id not in self.recurring:
+            return
+        self._call(database.set_occurrence_status, (task_id, day, new_status))
+        self.overrides.setdefault(task_id, {})[day] = new_status
+        self._publish("updated", [Occurrence(t, day, new_status)])
+
+    def delete_tasks(self, task_ids):
+        self._call(database.delete_tasks, (list(task_ids),))
+        deleted = []
+        for task_id in task_ids:
+            old = self.tasks.get(task_id)
+            if old is not None:
+                self._unindex(old)
+                self.overrides.pop(task_id, None)
+                deleted.append(old)
+        if deleted:
+            self._publish("deleted", deleted)
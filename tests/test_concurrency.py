@@ -0,0 +1,15 @@
+import pytest
+
+from bench.hammer import hammer
+
+PROCESSES = 4
+ROUNDS = 30
+
+
+@pytest.mark.parametrize("profile", ["default", "compat"])
+def test_processes_share_database_without_locked_errors(tmp_path, profile):
+    result = hammer(str(tmp_path / "planner.db"), PROCESSES, ROUNDS, profile)
+
+    assert result["locked"] == 0, result["workers"]
+    assert result["errors"] == 0, result["workers"]
+    assert [r["rounds"] for r in result["workers"]] == [ROUNDS] * PROCESSES
@@ -1,22 +1,80 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, simpledialog
-from tkcalendar import Calendar
+from tkinter import ttk, messagebox, scrolledtext, simpledialog, filedialog
 import calendar as pycalendar
 from datetime import date, datetime
 import os, sys
+import sqlite3
+import time
 
 import database
+import diagnostics
+import recurrence
+import reminders
 import settings as app_settings
+from virtual_tree import VirtualTreeview, ListSource, PagedSource
+from store import TaskStore
+from db_worker import DatabaseWorker
+from month_grid import MonthGrid
+from models import split_tags
+
+# Пауза после последнего нажатия клавиши в поиске перед обновлением списка, мс
+SEARCH_DEBOUNCE_MS = 250
+# Прошлый результат поиска больше этого сужается не в памяти, а запросом в потоке БД:
+# проверка ~2 мкс на строку в потоке Tk против FTS-запроса, не блокирующего окно
+NARROW_MAX_ROWS = 10000
+# Сортировка списка по клику на заголовок столбца → ключ database.TASK_ORDERS
+COLUMN_ORDERS = {"ID": "id", "Название": "title", "Категория": "category", "Приоритет": "priority",
+                 "Статус": "status", "Создано": "created_at", "Дедлайн": "deadline"}
+# Режимы фильтра по тегам (database.TAG_MODES)
+TAG_MODE_DISPLAY = {"all": "все", "any": "любой"}
+
+# Как часто обновляется окно диагностики, мс
+DIAGNOSTICS_REFRESH_MS = 1000
+
+# Отчёт о времени запуска печатается в stderr, если задана переменная окружения
+STARTUP_REPORT_ENV = "PLANNER_STARTUP_REPORT"
+
+
+def _calendar_class():
+    # tkcalendar (и babel) — заметная доля времени запуска, импортируем при первом использовании
+    from tkcalendar import Calendar
+    return Calendar
+
+
+def month_tasks_by_date(store, year, month):
+    # Задачи (и повторения) месяца по датам — данные для MonthGrid.render, без виджетов
+    last_day = pycalendar.monthrange(year, month)[1]
+    tasks = store.in_range(f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{last_day:02d}")
+    tasks_by_date = {}
+    for t in tasks:
+        dl = t.deadline
+        if dl:
+            tasks_by_date.setdefault(dl, []).append(t)
+    return tasks_by_date
+
 
 class TaskPlannerApp:
-    def __init__(self, root):
+    # Запуск по этапам: окно с пустым календарём → первый кадр → в фоне загрузка задач
+    # и мини-календарь. Вкладка «Задачи» строится при первом открытии
+    def __init__(self, root, started_at=None):
         self.root = root
+        self.startup_timings = []  # (этап, мс от запуска процесса)
+        self._started_at = started_at if started_at is not None else time.perf_counter()
+        self._startup_reported = False
+        self._mark_startup("импорт модулей")
         self.root.title("🗓️ Планировщик задач")
         self.root.geometry("1200x800")
 
-        # Инициализация базы и настроек
+        # Замеры database.*, отрисовки и списка; окно — Ctrl+Shift+D
+        diagnostics.install()
+
+        # Инициализация базы и настроек. Схема и настройки (тема, пароль) нужны до
+        # построения окна, дальше все обращения к БД идут через фоновый поток
         database.init_db()
-        self.settings = app_settings.load_settings()
+        self.db = DatabaseWorker(self.root)
+        self.store = TaskStore(worker=self.db, on_error=self._on_db_error)
+        self.settings = app_settings.get_settings(self.db.submit)
+        self._mark_startup("БД и настройки")
 
         # Проверка пароля (если задан)
         if self.settings.get("app_password"):
@@ -35,15 +93,47 @@ class TaskPlannerApp:
         # Построение интерфейса
         self._setup_window()
         self._build_ui()
-
-        # Отрисовка календаря и списка задач
         self._render_month(self.current_year, self.current_month)
-        self.refresh_task_list()
+        self._mark_startup("окно построено")
+
+        # Календарь и список — подписчики хранилища задач
+        self.store.subscribe(self._on_tasks_changed_month)
+        self.store.subscribe(self._on_tasks_changed_list)
+        # Напоминания: один таймер на ближайшее, обновляется событиями хранилища
+        self.reminders = reminders.ReminderScheduler(self.root, self.store, self._show_reminders,
+                                                     settings=self.settings)
+        self.status_bar.config(text="Загрузка задач…")
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.bind("<Control-Shift-KeyPress-D>", self.open_diagnostics_window)
+        self.root.bind("<Control-Shift-KeyPress-d>", self.open_diagnostics_window)
+        # Задачи грузятся после того, как окно отрисовано: after_idle ставится в очередь
+        # за перерисовкой, after(0) — уже следующая итерация цикла событий
+        self.root.after_idle(lambda: self.root.after(0, self._after_first_paint))
 
         # Предложение автозапуска при первом запуске
         if self.settings.get("autostart_enabled") is False:
             self._ask_autostart_once()
 
+    # ====== Запуск ======
+    def _mark_startup(self, stage):
+        self.startup_timings.append((stage, (time.perf_counter() - self._started_at) * 1000))
+
+    def _after_first_paint(self):
+        self._mark_startup("первый кадр")
+        self.store.load()
+        Calendar = _calendar_class()
+        self.mini_cal = Calendar(self.mini_cal_frame, selectmode='day', date_pattern='yyyy-mm-dd')
+        self.mini_cal.pack()
+        self._mark_startup("мини-календарь")
+
+    def _report_startup(self):
+        if self._startup_reported:
+            return
+        self._startup_reported = True
+        if os.environ.get(STARTUP_REPORT_ENV):
+            text = ", ".join(f"{stage} {ms:.0f} мс" for stage, ms in self.startup_timings)
+            print(f"Запуск: {text}", file=sys.stderr)
+
     # ====== Окно ======
     def _setup_window(self):
         self.canvas = tk.Canvas(self.root, highlightthickness=0, bg=self.bg)
@@ -87,9 +177,10 @@ class TaskPlannerApp:
                 self._try_set_colors(child)
         if hasattr(self, "canvas"):
             self._redraw_bg()
-        if hasattr(self, "month_grid") and hasattr(self, "current_year"):
+        if hasattr(self, "month_view") and hasattr(self, "current_year"):
+            self.month_view.invalidate()
             self._render_month(self.current_year, self.current_month)
-        if hasattr(self, "list_tab"):
+        if getattr(self, "_list_built", False):
             self.refresh_task_list()
 
     def _try_set_colors(self, widget):
@@ -124,8 +215,9 @@ class TaskPlannerApp:
 
         tk.Label(left, text="Календарь", bg=self.panel_bg, fg=self.fg,
                  font=("Arial", 11, "bold")).pack(pady=(8, 0))
-        self.mini_cal = Calendar(left, selectmode='day', date_pattern='yyyy-mm-dd')
-        self.mini_cal.pack(padx=8, pady=8)
+        # сам календарь появляется после первого кадра (_after_first_paint)
+        self.mini_cal_frame = tk.Frame(left, bg=self.panel_bg)
+        self.mini_cal_frame.pack(padx=8, pady=8)
 
         tk.Label(left, text="Категории", bg=self.panel_bg, fg=self.fg,
                  font=("Arial", 11, "bold")).pack(anchor="w", padx=8, pady=(8, 4))
@@ -157,15 +249,25 @@ class TaskPlannerApp:
 
         self.month_grid = tk.Frame(self.month_tab, bg=self.bg)
         self.month_grid.pack(fill="both", expand=True, padx=8, pady=8)
+        self.month_view = MonthGrid(self.month_grid, on_day=self._select_day_str,
+                                    on_task=self._select_task_day, on_task_menu=self._popup_status_menu)
 
         self.status_bar = tk.Label(self.month_tab, text="", bg=self.panel_bg,
                                    fg=self.fg, anchor="w")
         self.status_bar.pack(fill="x", padx=8, pady=(0, 8))
 
-        # Вкладка Задачи
+        # Вкладка Задачи — строится при первом выборе
         self.list_tab = tk.Frame(self.tabs, bg=self.bg)
         self.tabs.add(self.list_tab, text="Задачи")
-        self._build_list_tab(self.list_tab)
+        self._list_built = False
+        self._steps_job = None
+        self.tabs.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def _on_tab_changed(self, event=None):
+        if not self._list_built and self.tabs.select() == str(self.list_tab):
+            self._list_built = True
+            self._build_list_tab(self.list_tab)
+            self.refresh_task_list()
 
     # ====== Месячный календарь ======
     def _month_title(self):
@@ -184,86 +286,46 @@ class TaskPlannerApp:
         self.month_label.config(text=self._month_title())
         self._render_month(y, m)
 
+    @diagnostics.timed("ui.render_month")
     def _render_month(self, year, month):
-        for w in self.month_grid.winfo_children():
-            w.destroy()
-
-        days = ["Пн","Вт","Ср","Чт","Пт","Сб","Вс"]
-        for i, d in enumerate(days):
-            tk.Label(self.month_grid, text=d, bg=self.bg, fg=self.fg,
-                     font=("Arial", 10, "bold")).grid(row=0, column=i, padx=4, pady=4)
-
-        cal = pycalendar.Calendar(firstweekday=0)
-        month_days = cal.monthdayscalendar(year, month)
-
-        tasks = database.get_all_tasks()
-        tasks_by_date = {}
-        for t in tasks:
-            dl = t[4]
-            if dl:
-                tasks_by_date.setdefault(dl, []).append(t)
-
-        for r, week in enumerate(month_days, start=1):
-            for c, day in enumerate(week):
-                cell = tk.Frame(self.month_grid, bg="white", bd=1, relief="solid")
-                cell.grid(row=r, column=c, padx=2, pady=2, sticky="nsew")
-                self.month_grid.grid_columnconfigure(c, weight=1)
-                self.month_grid.grid_rowconfigure(r, weight=1)
-
-                if day == 0:
-                    continue
-
-                d_str = f"{year:04d}-{month:02d}-{day:02d}"
-
-                # Заголовок дня
-                hdr = tk.Frame(cell, bg="#e5e7eb")
-                hdr.pack(fill="x")
-                tk.Label(hdr, text=str(day), bg="#e5e7eb", fg="#111827").pack(side="left", padx=4)
-
-                # Список задач
-                body = tk.Frame(cell, bg="white")
-                body.pack(fill="both", expand=True)
-
-                for task in tasks_by_date.get(d_str, []):
-                    title = task[1]
-                    status = task[7]
-                    color = {
-                        "completed": "#d1fae5",   # зелёный
-                        "in progress": "#fde68a", # оранжевый
-                        "postponed": "#fecaca",   # красный
-                        "pending": "#f3f4f6"      # серый
-                    }.get(status, "#f3f4f6")
-                    lbl = tk.Label(body, text=title, bg=color, anchor="w")
-                    lbl.pack(fill="x", padx=4, pady=2)
-
-                    # ЛКМ — показать инфо
-                    lbl.bind("<Button-1>", lambda e, t=task, yy=year, mm=month, dd=day: self._select_day(yy, mm, dd, t))
-
-                    # ПКМ — контекстное меню статуса
-                    def _show_status_menu(ev, t=task):
-                        menu = tk.Menu(self.root, tearoff=0)
-                        menu.add_command(label="В процессе", command=lambda: self._set_task_status(t[0], "in progress"))
-                        menu.add_command(label="Завершено", command=lambda: self._set_task_status(t[0], "completed"))
-                        menu.add_command(label="Отложено", command=lambda: self._set_task_status(t[0], "postponed"))
-                        menu.add_command(label="В ожидании", command=lambda: self._set_task_status(t[0], "pending"))
-                        menu.tk_popup(ev.x_root, ev.y_root)
-                    lbl.bind("<Button-3>", _show_status_menu)
-
-                # Выделение сегодняшнего дня
-                today = date.today()
-                if today.year == year and today.month == month and today.day == day:
-                    cell.config(bg=self.accent)
-                    hdr.config(bg=self.accent)
-                    for ch in hdr.winfo_children():
-                        ch.config(bg=self.accent, fg="white")
-
-                # Клик по пустой области — выбрать день
-                cell.bind("<Button-1>", lambda e, dd=d_str: self._select_day_str(dd))
-
-    def _set_task_status(self, task_id, new_status):
-        database.update_task_status(task_id, new_status)
-        self._render_month(self.current_year, self.current_month)
-        self.refresh_task_list()
+        tasks_by_date = month_tasks_by_date(self.store, year, month)
+        self.month_view.render(year, month, tasks_by_date, bg=self.bg, fg=self.fg, accent=self.accent)
+
+    def _select_task_day(self, task, dstr):
+        y, m, d = map(int, dstr.split("-"))
+        self._select_day(y, m, d, task)
+
+    def _popup_status_menu(self, event, task_id, day=None):
+        # day — дата ячейки календаря: у повторяющейся задачи меняется статус этого дня
+        if not self.store.is_recurring(task_id):
+            day = None
+        menu = tk.Menu(self.root, tearoff=0)
+        menu.add_command(label="В процессе", command=lambda: self._set_task_status(task_id, "in progress", day))
+        menu.add_command(label="Завершено", command=lambda: self._set_task_status(task_id, "completed", day))
+        menu.add_command(label="Отложено", command=lambda: self._set_task_status(task_id, "postponed", day))
+        menu.add_command(label="В ожидании", command=lambda: self._set_task_status(task_id, "pending", day))
+        if day:
+            menu.add_separator()
+            menu.add_command(label="Завершить все повторения",
+                             command=lambda: self._set_task_status(task_id, "completed"))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def _set_task_status(self, task_id, new_status, day=None):
+        if day:
+            self.store.set_occurrence_status(task_id, day, new_status)
+        else:
+            self.store.update_statuses([task_id], new_status)
+
+    def _on_tasks_changed_month(self, kind, tasks):
+        # Перерисовываем сетку, только если изменение задело видимый месяц
+        prefix = f"{self.current_year:04d}-{self.current_month:02d}-"
+        if kind == "loaded" or any((t.deadline or "").startswith(prefix) or recurrence.rule_for(t)
+                                   for t in tasks):
+            self._render_month(self.current_year, self.current_month)
+        if kind == "loaded":
+            self.status_bar.config(text="")
+            self._mark_startup(f"задачи загружены ({len(tasks)})")
+            self._report_startup()
 
     def _select_day(self, y, m, d, task=None):
         dt = datetime(y, m, d)
@@ -298,15 +360,29 @@ class TaskPlannerApp:
 
         tk.Label(pnl, text="Категория:", bg=self.bg, fg=self.fg).pack(side="left", padx=(10, 2))
         self.filter_category = tk.StringVar(value="all")
-        self.cat_menu = ttk.Combobox(pnl, values=["all"] + self.settings.get("categories", []), width=18)
+        self.cat_menu = ttk.Combobox(pnl, values=["all"] + self.settings.categories(), width=18)
         self.cat_menu.bind("<<ComboboxSelected>>", lambda e: self.filter_category.set(self.cat_menu.get()) or self.refresh_task_list())
         self.cat_menu.set("all")
         self.cat_menu.pack(side="left", padx=3)
 
+        # Теги через запятую; из списка тег дописывается к уже введённым
+        tk.Label(pnl, text="Теги:", bg=self.bg, fg=self.fg).pack(side="left", padx=(10, 2))
+        self.filter_tags = ttk.Combobox(pnl, width=18, postcommand=lambda: self.filter_tags.configure(values=self.store.tags()))
+        self.filter_tags.pack(side="left", padx=3)
+        self.filter_tags.bind("<KeyRelease>", self._schedule_search)
+        self.filter_tags.bind("<<ComboboxSelected>>", self._on_tag_selected)
+        self.filter_tags_mode = ttk.Combobox(pnl, values=list(TAG_MODE_DISPLAY.values()), width=7, state="readonly")
+        self.filter_tags_mode.set(TAG_MODE_DISPLAY['all'])
+        self.filter_tags_mode.pack(side="left", padx=3)
+        self.filter_tags_mode.bind("<<ComboboxSelected>>", lambda e: self.refresh_task_list())
+
         tk.Label(pnl, text="Поиск:", bg=self.bg, fg=self.fg).pack(side="left", padx=(10, 2))
         self.filter_search = tk.Entry(pnl, width=24)
         self.filter_search.pack(side="left")
-        self.filter_search.bind("<KeyRelease>", lambda e: self.refresh_task_list())
+        self.filter_search.bind("<KeyRelease>", self._schedule_search)
+        self._search_job = None
+        self._search_text = ("", "")
+        self._list_result = None
 
         # Обёртка для Treeview, чтобы прокрутки были внутри вкладки
         tree_wrap = tk.Frame(parent, bg=self.bg)
@@ -327,10 +403,12 @@ class TaskPlannerApp:
         for col in columns:
             self.tree.heading(col, text=col, command=lambda c=col: self._sort_tree_by_column(c))
 
-        # Прокрутки в обе стороны
-        sb_y = ttk.Scrollbar(tree_wrap, orient="vertical", command=self.tree.yview)
+        # Прокрутки в обе стороны; вертикальной управляет виртуальный список
+        sb_y = ttk.Scrollbar(tree_wrap, orient="vertical")
         sb_x = ttk.Scrollbar(tree_wrap, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=sb_y.set, xscrollcommand=sb_x.set)
+        self.tree.configure(xscrollcommand=sb_x.set)
+        self.task_view = VirtualTreeview(self.tree, sb_y, self._task_row_values)
+        self._sort_order = None
 
         self.tree.grid(row=0, column=0, sticky="nsew")
         sb_y.grid(row=0, column=1, sticky="ns")
@@ -349,6 +427,10 @@ class TaskPlannerApp:
                   bg="#ef4444", fg="white").pack(side="left", padx=4)
         tk.Button(actions, text="🗑️ Удалить", command=self._bulk_delete,
                   bg="#dc2626", fg="white").pack(side="left", padx=4)
+        tk.Button(actions, text="📥 Импорт", command=self._import_from_file).pack(side="left", padx=4)
+        tk.Button(actions, text="📤 Экспорт", command=self._export_tasks).pack(side="left", padx=4)
+        self.progress_label = tk.Label(actions, text="", bg=self.bg, fg=self.fg)
+        self.progress_label.pack(side="left", padx=8)
 
         # Двойной клик — детали
         self.tree.bind("<Double-1>", self._show_task_details)
@@ -366,24 +448,19 @@ class TaskPlannerApp:
         iid = self.tree.identify_row(event.y)
         if not iid:
             return
-        self.tree.selection_set(iid)
-        tid = self.tree.item(iid)['values'][0]
-        menu = tk.Menu(self.root, tearoff=0)
-        menu.add_command(label="В процессе", command=lambda: self._set_task_status(tid, "in progress"))
-        menu.add_command(label="Завершено", command=lambda: self._set_task_status(tid, "completed"))
-        menu.add_command(label="Отложено", command=lambda: self._set_task_status(tid, "postponed"))
-        menu.add_command(label="В ожидании", command=lambda: self._set_task_status(tid, "pending"))
-        menu.tk_popup(event.x_root, event.y_root)
+        tid = int(iid)
+        self.task_view.select_only(tid)
+        self._popup_status_menu(event, tid)
 
     # ====== Копирование/вставка ======
     def _copy_selected_to_clipboard(self, event=None):
-        sel = self.tree.selection()
-        if not sel:
+        rows = self.task_view.selected_rows()
+        if not rows:
             return
         headers = ["ID","Название","Категория","Приоритет","Статус","Создано","Дедлайн"]
         lines = ["\t".join(headers)]
-        for iid in sel:
-            values = self.tree.item(iid)["values"]
+        for t in rows:
+            values = self._task_row_values(t)
             str_vals = [str(v if v is not None else "") for v in values]
             lines.append("\t".join(str_vals))
         text = "\n".join(lines)
@@ -400,162 +477,304 @@ class TaskPlannerApp:
         except Exception:
             data = ""
 
-        def _priority_from_ru(s):
-            return {"Низкий":"low","Средний":"medium","Высокий":"high"}.get(s, "medium")
-
-        def _status_from_ru(s):
-            return {"В ожидании":"pending","В процессе":"in progress","Завершено":"completed","Отложено":"postponed"}.get(s, "pending")
-
-        inserted = 0
-
-        # Импорт из TSV
-        if data and "\t" in data:
-            lines = [ln for ln in data.strip().splitlines() if ln.strip()]
-            start_idx = 1 if lines and lines[0].lower().startswith("id\t") else 0
-            for ln in lines[start_idx:]:
-                cols = ln.split("\t")
-                if len(cols) >= 7:
-                    title = cols[1].strip() or "Без названия"
-                    category = cols[2].strip()
-                    priority = _priority_from_ru(cols[3].strip())
-                    status = _status_from_ru(cols[4].strip())
-                    deadline = cols[6].strip() or None
-                    task_data = {
-                        'title': title,
-                        'description': '',
-                        'deadline': deadline,
-                        'priority': priority,
-                        'category': category,
-                        'status': status,
-                        'tags': '',
-                        'recurrence': None,
-                        'reminder': None
-                    }
-                    database.add_task(task_data)
-                    inserted += 1
-
-        # Если из буфера не получилось — дублируем выделенные
-        if inserted == 0:
-            sel = self.tree.selection()
-            if not sel:
-                return
-            ids = [self.tree.item(i)['values'][0] for i in sel]
-            all_tasks = {t[0]: t for t in database.get_all_tasks()}
-            for tid in ids:
-                t = all_tasks.get(tid)
-                if not t:
-                    continue
-                copy_data = {
-                    'title': f"{t[1]} (копия)",
-                    'description': t[2] or '',
-                    'deadline': t[4],
-                    'priority': t[5] or 'medium',
-                    'category': t[6] or '',
-                    'status': t[7] or 'pending',
-                    'tags': t[8] or '',
-                    'recurrence': t[9],
-                    'reminder': t[10]
-                }
-                database.add_task(copy_data)
-                inserted += 1
-
-        if inserted > 0:
-            self._render_month(self.current_year, self.current_month)
-            self.refresh_task_list()
-            messagebox.showinfo("Вставка", f"Добавлено задач: {inserted}")
+        # Таблица TSV/CSV из буфера — потоковый импорт
+        import importer
+        if data and importer.looks_like_table(data):
+            self._run_import(importer.read_text(data), "Вставка")
+            return
+
+        # Иначе дублируем выделенные
+        ids = self.task_view.selected_ids()
+        if not ids:
+            return
+        new_tasks = []
+        for t in self.store.get_many(ids):
+            copy_data = {
+                'title': f"{t.title} (копия)",
+                'description': t.description or '',
+                'deadline': t.deadline,
+                'priority': t.priority or 'medium',
+                'category': t.category or '',
+                'status': t.status or 'pending',
+                'tags': t.tags or '',
+                'recurrence': t.recurrence,
+                'reminder': t.reminder
+            }
+            new_tasks.append(copy_data)
+
+        if not new_tasks:
+            return
+        self.store.add_tasks(new_tasks, on_done=lambda tasks: messagebox.showinfo(
+            "Вставка", f"Добавлено задач: {len(tasks)}"))
+
+    # ====== Импорт ======
+    def _import_from_file(self):
+        path = filedialog.askopenfilename(title="Импорт задач",
+                                          filetypes=[("Таблицы CSV/TSV", "*.csv *.tsv *.txt"),
+                                                     ("Все файлы", "*.*")])
+        if path:
+            import importer
+            self._run_import(importer.read_file(path), "Импорт")
+
+    def _run_import(self, lines, title):
+        import importer
+        # Чтение и вставка идут в потоке БД; каждая пачка возвращается вместе с
+        # созданными задачами, а в хранилище они попадают одним пакетом в конце,
+        # так что представления обновятся один раз (и при ошибке — тоже)
+        imported = []
+
+        def steps():
+            added = []
+
+            def add_tasks(chunk):
+                tasks = TaskStore.insert(chunk)
+                added.extend(tasks)
+                return tasks
+
+            for result in importer.import_tasks(lines, add_tasks=add_tasks):
+                yield result, added[:]
+                added.clear()
+
+        def on_step(value):
+            imported.extend(value[1])
+
+        def on_finish():
+            self.store.apply_added(imported)
+            imported.clear()
+
+        self._run_steps(steps, title,
+                        lambda value: f"{title}: обработано {value[0].processed}, "
+                                      f"добавлено {value[0].inserted}, ошибок {value[0].error_count}",
+                        lambda title, value: self._finish_import(title, value and value[0]),
+                        on_step=on_step, on_finish=on_finish)
+
+    def _finish_import(self, title, result):
+        if result is None:
+            return
+        text = f"Добавлено задач: {result.inserted}"
+        if result.error_count:
+            lines = [f"строка {line_no}: {msg}" for line_no, msg in result.errors[:10]]
+            if result.error_count > len(lines):
+                lines.append(f"… и ещё {result.error_count - len(lines)}")
+            text += f"\nПропущено строк с ошибками: {result.error_count}\n\n" + "\n".join(lines)
+        messagebox.showinfo(title, text)
+
+    # ====== Экспорт ======
+    def _export_tasks(self):
+        path = filedialog.asksaveasfilename(title="Экспорт задач", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl"),
+                                                       ("iCalendar", "*.ics")])
+        if not path:
+            return
+        # Экспортируется то же, что показано в списке: с текущими фильтрами и сортировкой
+        filters, order = self._list_filters()
+        import exporter
+        self._run_steps(lambda: exporter.export_steps(path, order=order, **filters), "Экспорт",
+                        lambda n: f"Экспорт: записано задач {n}",
+                        lambda title, n: messagebox.showinfo(title, f"Экспортировано задач: {n or 0}"))
+
+    # ====== Длительные операции ======
+    def _run_steps(self, steps, title, describe, on_done, on_step=None, on_finish=None):
+        # steps() — генератор, выполняется в потоке БД; после каждого шага в потоке Tk
+        # обновляется строка прогресса, окно не замирает. on_finish вызывается в конце
+        # при любом исходе, до on_done или сообщения об ошибке
+        if self._steps_job is not None:
+            messagebox.showwarning(title, "Дождитесь завершения импорта/экспорта.")
+            return
+        last = [None]
+
+        def step(value):
+            last[0] = value
+            if on_step is not None:
+                on_step(value)
+            self.progress_label.config(text=describe(value))
+
+        def finish():
+            self._steps_job = None
+            self.progress_label.config(text="")
+            if on_finish is not None:
+                on_finish()
+
+        def done(value):
+            finish()
+            on_done(title, value)
+
+        def failed(e):
+            finish()
+            if not isinstance(e, (sqlite3.Error, OSError, UnicodeError, ValueError)):
+                raise e
+            progress = f"\n{describe(last[0])}" if last[0] is not None else ""
+            messagebox.showerror(title, f"Операция прервана: {e}{progress}")
+
+        self._steps_job = self.db.steps(steps, on_step=step, on_done=done, on_error=failed)
+
+    # ====== Поиск ======
+    def _schedule_search(self, event=None):
+        # Стрелки, Shift и т.п. текст не меняют — обновлять нечего
+        text = (self.filter_search.get().strip(), self.filter_tags.get().strip())
+        if text == self._search_text:
+            return
+        self._search_text = text
+        # Новое нажатие отменяет ещё не выполненный поиск
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _on_tag_selected(self, event=None):
+        # Выбор из списка заменяет текст поля — возвращаем прежние теги и дописываем выбранный
+        prev = self._search_text[1]
+        tag = self.filter_tags.get()
+        if prev and tag not in split_tags(prev):
+            self.filter_tags.set(f"{prev.rstrip(',; ')}, {tag}")
+        elif prev:
+            self.filter_tags.set(prev)
+        self._search_text = (self._search_text[0], self.filter_tags.get().strip())
+        self.refresh_task_list()
+
+    def _run_search(self):
+        self._search_job = None
+        self.refresh_task_list(narrow=True)
 
     # ====== Хелперы списка ======
-    def refresh_task_list(self):
+    def _list_filters(self):
+        # Текущие фильтры вкладки «Задачи» в виде аргументов query_tasks и ключ сортировки
         status = self.filter_status.get() if hasattr(self, "filter_status") else "all"
         category = self.filter_category.get() if hasattr(self, "filter_category") else "all"
         keyword = self.filter_search.get().strip() if hasattr(self, "filter_search") else ""
+        tags = split_tags(self.filter_tags.get()) if hasattr(self, "filter_tags") else []
+        modes = {label: mode for mode, label in TAG_MODE_DISPLAY.items()}
+        tags_mode = modes.get(self.filter_tags_mode.get(), 'all') if hasattr(self, "filter_tags_mode") else 'all'
+        filters = dict(status=None if status == "all" else status,
+                       category=None if category == "all" else category,
+                       keyword=keyword or None,
+                       tags=tags or None, tags_mode=tags_mode)
+        order = getattr(self, "_sort_order", None) or ('rank' if keyword else 'priority')
+        return filters, order
+
+    @staticmethod
+    def _list_key(filters, order):
+        # Всё, кроме ключевого слова: при равном ключе и слове сохраняется позиция прокрутки
+        return (filters['status'], filters['category'], tuple(filters['tags'] or ()),
+                filters['tags_mode'], order)
+
+    @diagnostics.timed("ui.refresh_task_list")
+    def refresh_task_list(self, narrow=False):
+        filters, order = self._list_filters()
+        keyword = filters['keyword'] or ""
+        key = self._list_key(filters, order)
+
+        # Дописали символы к прошлому запросу при тех же фильтрах — сужаем прошлый
+        # результат в памяти по тексту, посчитанному при загрузке хранилища
+        ids = None
+        prev = self._list_result
+        rows = getattr(prev[2], "rows", None) if prev else None
+        if narrow and rows is not None and len(rows) <= NARROW_MAX_ROWS and prev[0] == key and prev[1]:
+            ids = self.store.narrow([t.id for t in rows], keyword, prev[1])
+        if ids is not None:
+            self._show_search(key, keyword, ids)
+        elif not self.store.loaded:
+            # Задачи ещё грузятся — страницы списка читаются из БД по мере прокрутки,
+            # число строк для полосы прокрутки считается в потоке БД
+            self.db.submit(database.count_tasks, key="search",
+                           on_done=lambda total: self._show_paged(key, keyword, total),
+                           on_error=self._on_db_error, **filters)
+        elif keyword.split():
+            # полнотекстовый поиск — в потоке БД; пока запрос ждёт очереди, новые
+            # обновления списка заменяют его, а устаревший ответ отбрасывается
+            self.db.submit(database.search_task_ids, keyword, key="search",
+                           on_done=lambda ids: self._show_search(key, keyword, ids),
+                           on_error=self._on_db_error)
+        else:
+            self._show_list(key, keyword, ListSource(self.store.query(order=order, **filters)))
 
-        tasks = database.get_all_tasks_ordered()
-        if status != "all":
-            tasks = [t for t in tasks if t[7] == status]
-        if category != "all":
-            tasks = [t for t in tasks if (t[6] or "") == category]
-        if keyword:
-            kw = keyword.lower()
-            tasks = [t for t in tasks if kw in (t[1] or "").lower() or kw in (t[2] or "").lower()]
-
-        if hasattr(self, "tree"):
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            priority_display = {"low":"Низкий","medium":"Средний","high":"Высокий"}
-            status_display = {"pending":"В ожидании","in progress":"В процессе","completed":"Завершено","postponed":"Отложено"}
-            for t in tasks:
-                created_date = (t[3].split()[0] if isinstance(t[3], str) else str(t[3])[:10]) if t[3] else ""
-                deadline_date = t[4] or ""
-                self.tree.insert("", "end", values=(t[0], t[1], t[6] or "",
-                                                    priority_display.get(t[5], t[5]),
-                                                    status_display.get(t[7], t[7]),
-                                                    created_date, deadline_date))
+    def _show_paged(self, key, keyword, total):
+        filters, order = self._list_filters()
+        if self._list_key(filters, order) != key or (filters['keyword'] or "") != keyword:
+            return
+        if self.store.loaded:
+            # хранилище успело загрузиться, пока считались строки, — список уже
+            # обновлён по событию "loaded"
+            return
+
+        def fetch(offset, limit):
+            return database.query_tasks(order=order, limit=limit, offset=offset, **filters)
+        self._show_list(key, keyword, PagedSource(total, fetch))
+
+    def _show_search(self, key, keyword, ids):
+        filters, order = self._list_filters()
+        if self._list_key(filters, order) != key or (filters['keyword'] or "") != keyword:
+            return
+        self._show_list(key, keyword, ListSource(self.store.query(order=order, matches=ids, **filters)))
 
+    def _show_list(self, key, keyword, source):
+        prev = getattr(self, "_list_result", None)
+        self._list_result = (key, keyword, source)
+
+        if hasattr(self, "task_view"):
+            # После изменения задач позиция прокрутки сохраняется, при смене фильтров — сброс
+            same_view = prev is not None and prev[0] == key and prev[1] == keyword
+            self.task_view.set_source(source, keep_position=same_view)
+
+    def _on_tasks_changed_list(self, kind, tasks):
+        if not self._list_built:
+            return
+        # Запрос к хранилищу в памяти; в Treeview попадает только дифф видимого окна
+        self.refresh_task_list()
+
+    @staticmethod
+    def _task_row_values(t):
+        return (t.id, t.title, t.category or "", t.priority_label, t.status_label,
+                t.created_date, t.deadline or "")
+
+    @diagnostics.timed("ui.sort_tree_by_column")
     def _sort_tree_by_column(self, col):
-        items = [(self.tree.set(i, col), i) for i in self.tree.get_children("")]
-        try:
-            def keyfunc(x):
-                val = x[0]
-                if col == "ID":
-                    try:
-                        return int(val)
-                    except Exception:
-                        return 0
-                return val
-            items.sort(key=keyfunc)
-        except Exception:
-            pass
-        for idx, (_, iid) in enumerate(items):
-            self.tree.move(iid, "", idx)
+        # Сортирует весь результат в SQL, а не только загруженные строки
+        self._sort_order = COLUMN_ORDERS.get(col)
+        self.refresh_task_list()
 
     def _bulk_status(self, new_status):
-        sel = self.tree.selection()
-        if not sel:
+        ids = self.task_view.selected_ids()
+        if not ids:
             messagebox.showwarning("Статус", "Выберите задачи.")
             return
-        for iid in sel:
-            tid = self.tree.item(iid)['values'][0]
-            database.update_task_status(tid, new_status)
-        self._render_month(self.current_year, self.current_month)
-        self.refresh_task_list()
+        self.store.update_statuses(ids, new_status)
 
     def _bulk_delete(self):
-        sel = self.tree.selection()
-        if not sel:
+        ids = self.task_view.selected_ids()
+        if not ids:
             messagebox.showwarning("Удаление", "Выберите задачи.")
             return
-        if not messagebox.askyesno("Удаление", f"Удалить выбранные задачи ({len(sel)})?"):
+        if not messagebox.askyesno("Удаление", f"Удалить выбранные задачи ({len(ids)})?"):
             return
-        for iid in sel:
-            tid = self.tree.item(iid)['values'][0]
-            database.delete_task(tid)
-        self._render_month(self.current_year, self.current_month)
-        self.refresh_task_list()
+        self.task_view.selected.clear()
+        self.store.delete_tasks(ids)
 
     def _show_task_details(self, event=None):
         sel = self.tree.selection()
         if not sel:
             return
-        tid = self.tree.item(sel[0])['values'][0]
-        for t in database.get_all_tasks():
-            if t[0] == tid:
-                self._show_task_info_popup(t)
-                break
+        t = self.store.get(int(sel[0]))
+        if t:
+            self._show_task_info_popup(t)
 
     def _show_task_info_popup(self, task):
-        status_display = {"pending":"В ожидании","in progress":"В процессе","completed":"Завершено","postponed":"Отложено"}
-        priority_display = {"low":"Низкий","medium":"Средний","high":"Высокий"}
-        txt = (f"Название: {task[1]}\nКатегория: {task[6] or ''}\n"
-               f"Приоритет: {priority_display.get(task[5], task[5])}\n"
-               f"Дедлайн: {task[4] or ''}\nСтатус: {status_display.get(task[7], task[7])}\n\nОписание:\n{task[2] or 'Нет описания'}")
+        txt = (f"Название: {task.title}\nКатегория: {task.category or ''}\n"
+               f"Приоритет: {task.priority_label}\n"
+               f"Дедлайн: {task.deadline or ''}\nСтатус: {task.status_label}\n")
+        if task.recurrence:
+            txt += f"Повтор: {recurrence.describe(task.recurrence)}\n"
+        if task.reminder:
+            txt += f"Напоминание: {task.reminder}\n"
+        if task.tags:
+            txt += f"Теги: {task.tags}\n"
+        txt += f"\nОписание:\n{task.description or 'Нет описания'}"
         messagebox.showinfo("Задача", txt)
 
     # ====== Создание задачи ======
     def open_create_task_window(self):
         win = tk.Toplevel(self.root)
         win.title("Создать задачу")
-        win.geometry("480x560")
+        win.geometry("480x730")
         win.configure(bg=self.panel_bg)
         win.transient(self.root)
         win.grab_set()
@@ -571,7 +790,7 @@ class TaskPlannerApp:
         tk.Label(win, text="Категория:", bg=self.panel_bg, fg=self.fg).pack(anchor="w", padx=12, pady=(12,4))
         cat_frame = tk.Frame(win, bg=self.panel_bg)
         cat_frame.pack(fill="x", padx=12)
-        cat_combo = ttk.Combobox(cat_frame, values=self.settings.get("categories", []), width=24)
+        cat_combo = ttk.Combobox(cat_frame, values=self.settings.categories(), width=24)
         cat_combo.pack(side="left", padx=(0,6))
         new_cat_entry = tk.Entry(cat_frame)
         new_cat_entry.pack(side="left", fill="x", expand=True)
@@ -584,13 +803,26 @@ class TaskPlannerApp:
         pr_combo.pack(fill="x", padx=12)
 
         tk.Label(win, text="Дедлайн:", bg=self.panel_bg, fg=self.fg).pack(anchor="w", padx=12, pady=(12,4))
-        cal = Calendar(win, selectmode='day', date_pattern='yyyy-mm-dd')
+        cal = _calendar_class()(win, selectmode='day', date_pattern='yyyy-mm-dd')
         cal.pack(padx=12, pady=6)
 
+        tk.Label(win, text="Повтор:", bg=self.panel_bg, fg=self.fg).pack(anchor="w", padx=12, pady=(6,4))
+        rec_combo = ttk.Combobox(win, values=["Не повторять"] + list(recurrence.PRESET_DISPLAY.values()))
+        rec_combo.set("Не повторять")
+        rec_combo.pack(fill="x", padx=12)
+
+        tk.Label(win, text="Напоминание (ЧЧ:ММ в день дедлайна):", bg=self.panel_bg, fg=self.fg).pack(anchor="w", padx=12, pady=(6,4))
+        rem_entry = tk.Entry(win)
+        rem_entry.pack(fill="x", padx=12)
+
+        tk.Label(win, text="Теги (через запятую):", bg=self.panel_bg, fg=self.fg).pack(anchor="w", padx=12, pady=(6,4))
+        tags_entry = tk.Entry(win)
+        tags_entry.pack(fill="x", padx=12)
+
         btns = tk.Frame(win, bg=self.panel_bg)
         btns.pack(fill="x", padx=12, pady=12)
         tk.Button(btns, text="Создать", bg=self.accent, fg="white",
-                  command=lambda: self._create_task_action(win, title_entry, desc_entry, cat_combo, new_cat_entry, pr_combo, cal)).pack(side="left")
+                  command=lambda: self._create_task_action(win, title_entry, desc_entry, cat_combo, new_cat_entry, pr_combo, cal, rec_combo, rem_entry, tags_entry)).pack(side="left")
         tk.Button(btns, text="Отмена", command=win.destroy).pack(side="right")
 
     def _add_category_from_entry(self, entry, combo):
@@ -598,14 +830,13 @@ class TaskPlannerApp:
         if not name:
             messagebox.showwarning("Категория", "Введите название категории.")
             return
-        app_settings.add_category(name)
-        self.settings = app_settings.load_settings()
-        combo['values'] = self.settings['categories']
+        self.settings.add_category(name)
+        combo['values'] = self.settings.categories()
         entry.delete(0, tk.END)
         self._refresh_categories_listbox()
         messagebox.showinfo("Категория", f"Категория «{name}» добавлена.")
 
-    def _create_task_action(self, win, title_entry, desc_entry, cat_combo, new_cat_entry, pr_combo, cal):
+    def _create_task_action(self, win, title_entry, desc_entry, cat_combo, new_cat_entry, pr_combo, cal, rec_combo, rem_entry, tags_entry):
         title = title_entry.get().strip()
         if not title:
             messagebox.showerror("Ошибка", "Введите название задачи!")
@@ -615,6 +846,23 @@ class TaskPlannerApp:
         priority_map = {"Низкий":"low","Средний":"medium","Высокий":"high"}
         priority = priority_map.get(pr_combo.get().strip(), "medium")
         deadline = cal.get_date()
+        # Выбранный пункт или правило RRULE, введённое вручную
+        rec_text = rec_combo.get().strip()
+        presets = {label: name for name, label in recurrence.PRESET_DISPLAY.items()}
+        rule = presets.get(rec_text, "" if rec_text == "Не повторять" else rec_text)
+        if rule:
+            try:
+                rule = recurrence.parse_rule(rule).to_rrule()
+            except ValueError as e:
+                messagebox.showerror("Ошибка", f"Неверное правило повтора: {e}")
+                return
+        reminder = None
+        if rem_entry.get().strip():
+            try:
+                reminder = reminders.normalize_reminder(f"{deadline} {rem_entry.get().strip()}")
+            except ValueError:
+                messagebox.showerror("Ошибка", "Время напоминания — в формате ЧЧ:ММ.")
+                return
 
         task_data = {
             'title': title,
@@ -623,14 +871,177 @@ class TaskPlannerApp:
             'priority': priority,
             'category': category,
             'status': 'pending',
-            'tags': '',
-            'recurrence': None,
-            'reminder': None
+            'tags': ", ".join(split_tags(tags_entry.get())),
+            'recurrence': rule or None,
+            'reminder': reminder
         }
-        database.add_task(task_data)
+        self.store.add_tasks([task_data])
         win.destroy()
-        self._render_month(self.current_year, self.current_month)
-        self.refresh_task_list()
+
+    # ====== Фоновый поток БД ======
+    def _on_db_error(self, exc):
+        messagebox.showerror("База данных", f"Ошибка при работе с базой данных: {exc}")
+
+    # ====== Напоминания ======
+    def _show_reminders(self, tasks):
+        win = tk.Toplevel(self.root)
+        win.title("Напоминание")
+        win.configure(bg=self.panel_bg)
+        win.attributes("-topmost", True)
+        lines = [f"• {t.title}" + (f" (дедлайн {t.deadline})" if t.deadline else "") for t in tasks[:15]]
+        if len(tasks) > len(lines):
+            lines.append(f"… и ещё {len(tasks) - len(lines)}")
+        tk.Label(win, text="\n".join(lines), bg=self.panel_bg, fg=self.fg, justify="left",
+                 font=("Arial", 11)).pack(anchor="w", padx=16, pady=12)
+        btns = tk.Frame(win, bg=self.panel_bg)
+        btns.pack(fill="x", padx=12, pady=(0, 12))
+        ids = [t.id for t in tasks]
+
+        def snooze():
+            self.store.set_reminders(ids, reminders.format_reminder(time.time() + 10 * 60))
+            win.destroy()
+
+        tk.Button(btns, text="OK", command=win.destroy, bg=self.accent, fg="white").pack(side="right")
+        tk.Button(btns, text="Отложить на 10 мин", command=snooze).pack(side="right", padx=6)
+        self.root.bell()
+
+    def _on_close(self):
+        self.reminders.stop()
+        # дожидаемся записей, которые ещё стоят в очереди потока БД
+        self.db.close(timeout=10)
+        if os.environ.get(diagnostics.DUMP_ENV):
+            diagnostics.dump(os.environ[diagnostics.DUMP_ENV], self._diagnostics_extra())
+        self.root.destroy()
+
+    # ====== Диагностика ======
+    def _diagnostics_extra(self):
+        # Что добавить к замерам в JSON: этапы запуска и размер данных
+        return {
+            "startup": [{"stage": stage, "ms": round(ms, 1)} for stage, ms in self.startup_timings],
+            "tasks": len(self.store.tasks),
+            "recurring": len(self.store.recurring),
+            "reminders_pending": self.reminders.pending(),
+        }
+
+    def open_diagnostics_window(self, event=None):
+        # Скрытое окно (Ctrl+Shift+D): гистограммы операций, медленные операции с SQL,
+        # профилирование cProfile и сохранение всего в JSON
+        win = getattr(self, "_diagnostics_win", None)
+        if win is not None and win.winfo_exists():
+            win.lift()
+            return
+        win = self._diagnostics_win = tk.Toplevel(self.root)
+        win.title("Диагностика")
+        win.geometry("900x620")
+        win.configure(bg=self.panel_bg)
+
+        bar = tk.Frame(win, bg=self.panel_bg)
+        bar.pack(fill="x", padx=8, pady=6)
+        enabled = tk.BooleanVar(value=diagnostics.enabled)
+        tk.Checkbutton(bar, text="Сбор замеров", variable=enabled, bg=self.panel_bg, fg=self.fg,
+                       selectcolor=self.bg, command=lambda: diagnostics.set_enabled(enabled.get())).pack(side="left")
+        tk.Button(bar, text="Сбросить", command=lambda: (diagnostics.reset(), refresh())).pack(side="left", padx=4)
+        profile_btn = tk.Button(bar, command=lambda: toggle_profile())
+        profile_btn.pack(side="left", padx=4)
+        tk.Button(bar, text="Сохранить JSON…", command=lambda: self._save_diagnostics(win)).pack(side="left", padx=4)
+        summary = tk.Label(bar, bg=self.panel_bg, fg=self.fg)
+        summary.pack(side="right")
+
+        columns = ("Операция", "Вызовов", "Всего, мс", "Среднее", "p50", "p95", "p99", "Макс")
+        table = ttk.Treeview(win, columns=columns, show="headings", height=12)
+        for col in columns:
+            table.heading(col, text=col)
+            table.column(col, width=300 if col == "Операция" else 80, anchor="w" if col == "Операция" else "e")
+        table.pack(fill="both", expand=True, padx=8)
+
+        tabs = ttk.Notebook(win)
+        tabs.pack(fill="both", expand=True, padx=8, pady=8)
+        texts = {}
+        for name in ("Гистограмма", "Медленные операции", "Профиль"):
+            text = scrolledtext.ScrolledText(tabs, height=10, font=("Consolas", 9))
+            tabs.add(text.frame, text=name)
+            texts[name] = text
+
+        def set_text(name, value):
+            text = texts[name]
+            text.configure(state="normal")
+            text.delete("1.0", tk.END)
+            text.insert("1.0", value)
+            text.configure(state="disabled")
+
+        def show_histogram(event=None):
+            sel = table.selection()
+            stats = diagnostics.histograms().get(sel[0]) if sel else None
+            if not stats:
+                set_text("Гистограмма", "Выберите операцию в таблице.")
+                return
+            top = max(stats["buckets"].values())
+            lines = [f"{sel[0]}: {stats['count']} вызовов, мин {stats['min_ms']} мс, макс {stats['max_ms']} мс", ""]
+            for bucket, n in stats["buckets"].items():
+                lines.append(f"{bucket:>8} мс  {n:>7}  " + "█" * max(1, round(40 * n / top)))
+            set_text("Гистограмма", "\n".join(lines))
+
+        def toggle_profile():
+            if diagnostics.profiling():
+                set_text("Профиль", diagnostics.stop_profile() or "")
+                tabs.select(texts["Профиль"].frame)
+            else:
+                diagnostics.start_profile()
+            profile_btn.configure(text="Остановить профилирование" if diagnostics.profiling()
+                                  else "Профилировать (cProfile)")
+
+        shown_slow = [None]
+
+        def refresh():
+            # Строки обновляются на месте: выделение и прокрутка таблицы сохраняются
+            stats = diagnostics.histograms()
+            for name in table.get_children():
+                if name not in stats:
+                    table.delete(name)
+            for index, (name, h) in enumerate(sorted(stats.items(), key=lambda item: item[1]["total_ms"],
+                                                     reverse=True)):
+                values = (name, h["count"], f"{h['total_ms']:.1f}", f"{h['mean_ms']:.2f}",
+                          h["p50_ms"], h["p95_ms"], h["p99_ms"], f"{h['max_ms']:.1f}")
+                if table.exists(name):
+                    table.item(name, values=values)
+                    table.move(name, "", index)
+                else:
+                    table.insert("", index, iid=name, values=values)
+            slow = diagnostics.slow_operations()
+            key = (len(slow), slow[-1]["at"] if slow else None)
+            if key != shown_slow[0]:
+                # журнал переписывается, только если в нём что-то появилось
+                shown_slow[0] = key
+                lines = []
+                for entry in reversed(slow):
+                    lines.append(f"{entry['at']}  {entry['operation']}  {entry['ms']:.1f} мс  [{entry['thread']}]")
+                    for st in entry["statements"]:
+                        lines.append(f"    {st['execute_ms']:.1f} мс  {st['sql']}  {st['params']}")
+                set_text("Медленные операции", "\n".join(lines) or f"Операций дольше {diagnostics.slow_ms} мс не было.")
+            summary.config(text=f"операций: {len(stats)}, медленных: {len(slow)}")
+            show_histogram()
+
+        def tick():
+            if win.winfo_exists():
+                refresh()
+                win.after(DIAGNOSTICS_REFRESH_MS, tick)
+
+        table.bind("<<TreeviewSelect>>", show_histogram)
+        profile_btn.configure(text="Остановить профилирование" if diagnostics.profiling()
+                              else "Профилировать (cProfile)")
+        set_text("Профиль", diagnostics.last_profile() or "Профиль ещё не снимался.")
+        tick()
+
+    def _save_diagnostics(self, parent):
+        path = filedialog.asksaveasfilename(parent=parent, title="Сохранить диагностику",
+                                            defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                            initialfile=f"planner-diagnostics-{datetime.now():%Y%m%d-%H%M%S}.json")
+        if not path:
+            return
+        try:
+            diagnostics.dump(path, self._diagnostics_extra())
+        except OSError as e:
+            messagebox.showerror("Диагностика", f"Не удалось сохранить: {e}", parent=parent)
 
     # ====== Настройки/категории ======
     def open_settings_window(self):
@@ -656,7 +1067,7 @@ class TaskPlannerApp:
         cats_frame = tk.Frame(win, bg=self.panel_bg)
         cats_frame.pack(fill="x", padx=10)
         cats_list = tk.Listbox(cats_frame, height=6)
-        for c in self.settings['categories']:
+        for c in self.settings.categories():
             cats_list.insert("end", c)
         cats_list.pack(side="left", fill="both", expand=True)
         ctrl = tk.Frame(cats_frame, bg=self.panel_bg)
@@ -667,10 +1078,11 @@ class TaskPlannerApp:
         tk.Button(ctrl, text="➖", command=lambda: self._remove_category_from_settings(cats_list)).pack(pady=2)
 
         def save_settings_action():
-            app_settings.set_password(pwd_entry.get())
-            app_settings.set_theme(theme_var.get())
-            app_settings.set_autostart(autostart_var.get())
-            self.settings = app_settings.load_settings()
+            # все поля — одной транзакцией в таблицу settings
+            with self.settings.batch():
+                self.settings['app_password'] = pwd_entry.get() or ""
+                self.settings['theme'] = theme_var.get()
+                self.settings['autostart_enabled'] = bool(autostart_var.get())
             self._apply_theme(self.settings['theme'])
             if autostart_var.get():
                 self._enable_autostart()
@@ -685,10 +1097,9 @@ class TaskPlannerApp:
         name = entry.get().strip()
         if not name:
             return
-        app_settings.add_category(name)
-        self.settings = app_settings.load_settings()
+        self.settings.add_category(name)
         listbox.delete(0, "end")
-        for c in self.settings['categories']:
+        for c in self.settings.categories():
             listbox.insert("end", c)
         entry.delete(0, tk.END)
 
@@ -697,14 +1108,13 @@ class TaskPlannerApp:
         if not sel:
             return
         name = listbox.get(sel[0])
-        app_settings.remove_category(name)
-        self.settings = app_settings.load_settings()
+        self.settings.remove_category(name)
         listbox.delete(sel[0])
 
     def _refresh_categories_listbox(self):
         if hasattr(self, "cal_list"):
             self.cal_list.delete(0, "end")
-            for c in self.settings.get("categories", []):
+            for c in self.settings.categories():
                 self.cal_list.insert("end", c)
 
     # ====== Пароль и автозапуск ======
@@ -716,7 +1126,6 @@ class TaskPlannerApp:
         if messagebox.askyesno("Автозапуск", "Включить запуск приложения при старте ПК?"):
             self._enable_autostart()
             self.settings['autostart_enabled'] = True
-            app_settings.set_autostart(True)
 
     def _enable_autostart(self):
         try:
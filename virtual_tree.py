@@ -0,0 +1,250 @@
+from collections import OrderedDict
+from tkinter import ttk
+
+import diagnostics
+
+# Строки подгружаются страницами; в кэше — видимое окно и пара страниц вокруг
+PAGE_SIZE = 100
+MAX_CACHED_PAGES = 4
+
+CONTROL_MASK = 0x0004
+SHIFT_MASK = 0x0001
+
+
+class ListSource:
+    # Результат, целиком лежащий в памяти
+    def __init__(self, rows):
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+    def page(self, offset, limit):
+        return self.rows[offset:offset + limit]
+
+
+class PagedSource:
+    # Результат в БД: fetch(offset, limit) отдаёт одну страницу по мере прокрутки,
+    # total (COUNT(*) тем же запросом) держит полосу прокрутки точной
+    def __init__(self, total, fetch):
+        self.total = total
+        self.fetch = fetch
+
+    def count(self):
+        return self.total
+
+    def page(self, offset, limit):
+        return self.fetch(offset, limit)
+
+
+class VirtualTreeview:
+    # В ttk.Treeview живут только видимые строки; вертикальную прокрутку ведём сами.
+    # iid строки = id задачи (row.id), выделение хранится по id и переживает прокрутку.
+    # Обновления окна применяются диффом: insert/item/move/delete только для изменённых строк
+    def __init__(self, tree, scrollbar, format_row):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.source = ListSource([])
+        self.total = 0
+        self.top = 0
+        self.visible = int(tree.cget("height"))
+        self.selected = {}  # id -> строка, в порядке выделения
+        self._pages = OrderedDict()
+        self._shown = {}  # iid -> values строк, которые сейчас в Treeview
+
+        scrollbar.configure(command=self._on_scrollbar)
+        tree.bind("<Configure>", self._on_resize, add="+")
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        tree.bind("<ButtonPress-1>", self._on_click, add="+")
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", self._on_wheel)
+        tree.bind("<Button-5>", self._on_wheel)
+        tree.bind("<Up>", lambda e: self._on_arrow(e, -1))
+        tree.bind("<Down>", lambda e: self._on_arrow(e, 1))
+        tree.bind("<Prior>", lambda e: self._scroll_by(-self.visible))
+        tree.bind("<Next>", lambda e: self._scroll_by(self.visible))
+        tree.bind("<Home>", lambda e: self._scroll_by(-self.total))
+        tree.bind("<End>", lambda e: self._scroll_by(self.total))
+
+    # ====== Данные ======
+    def set_source(self, source, keep_position=False):
+        self.source = source
+        self.total = source.count()
+        self._pages.clear()
+        if not keep_position:
+            self.top = 0
+        self._clamp()
+        self._render()
+
+    def _page(self, number):
+        rows = self._pages.get(number)
+        if rows is None:
+            rows = self.source.page(number * PAGE_SIZE, PAGE_SIZE)
+            self._pages[number] = rows
+            while len(self._pages) > MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return rows
+
+    def _rows(self, start, end):
+        rows = []
+        for number in range(start // PAGE_SIZE, (end - 1) // PAGE_SIZE + 1):
+            page = self._page(number)
+            lo = max(start - number * PAGE_SIZE, 0)
+            hi = min(end - number * PAGE_SIZE, len(page))
+            rows.extend(page[lo:hi])
+        return rows
+
+    def visible_rows(self):
+        if not self.total:
+            return []
+        return self._rows(self.top, min(self.total, self.top + self.visible))
+
+    # ====== Выделение ======
+    def selected_ids(self):
+        return list(self.selected)
+
+    def selected_rows(self):
+        return list(self.selected.values())
+
+    def select_only(self, task_id):
+        self.selected.clear()
+        iid = str(task_id)
+        if self.tree.exists(iid):
+            self.tree.selection_set(iid)
+            self.tree.focus(iid)
+
+    def _on_click(self, event):
+        # Обычный клик сбрасывает и то выделение, что сейчас за пределами окна
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return
+        if not event.state & (CONTROL_MASK | SHIFT_MASK):
+            self.selected.clear()
+
+    def _on_select(self, event=None):
+        chosen = set(self.tree.selection())
+        for row in self.visible_rows():
+            if str(row.id) in chosen:
+                self.selected.setdefault(row.id, row)
+            else:
+                self.selected.pop(row.id, None)
+
+    # ====== Прокрутка ======
+    def _clamp(self):
+        self.top = max(0, min(self.top, self.total - self.visible))
+
+    def scroll_to(self, top):
+        old = self.top
+        self.top = top
+        self._clamp()
+        if self.top != old:
+            self._render()
+
+    def _scroll_by(self, delta):
+        self.scroll_to(self.top + delta)
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            delta = -3
+        elif event.num == 5:
+            delta = 3
+        else:
+            delta = -3 * int(event.delta / 120) or (-1 if event.delta > 0 else 1)
+        return self._scroll_by(delta)
+
+    def _on_arrow(self, event, direction):
+        # На краю окна стрелка прокручивает список, а не упирается в него
+        children = self.tree.get_children()
+        if not children:
+            return None
+        edge = children[-1] if direction > 0 else children[0]
+        if self.tree.focus() != edge:
+            return None
+        old_top = self.top
+        self.scroll_to(self.top + direction)
+        if self.top == old_top:
+            return "break"
+        children = self.tree.get_children()
+        iid = children[-1] if direction > 0 else children[0]
+        if not event.state & SHIFT_MASK:
+            self.selected.clear()
+            self.tree.selection_set(iid)
+        else:
+            self.tree.selection_add(iid)
+        self.tree.focus(iid)
+        return "break"
+
+    def _on_resize(self, event):
+        style = ttk.Style()
+        try:
+            row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        except ValueError:
+            row_height = 20
+        heading = 24
+        children = self.tree.get_children()
+        if children:
+            bbox = self.tree.bbox(children[0])
+            if bbox:
+                heading, row_height = bbox[1], bbox[3]
+        visible = max(1, (event.height - heading) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self._clamp()
+            self._render()
+
+    # ====== Отрисовка ======
+    @diagnostics.timed("virtual_tree.render")
+    def _render(self):
+        # Применяем к Treeview только разницу между старым и новым окном:
+        # неизменённые строки не трогаем, поэтому фокус и выделение сохраняются
+        tree = self.tree
+        rows = self.visible_rows()
+        new_iids = [str(row.id) for row in rows]
+        keep = set(new_iids)
+        gone = [iid for iid in self._shown if iid not in keep]
+        if gone:
+            tree.delete(*gone)
+            for iid in gone:
+                del self._shown[iid]
+
+        current = list(tree.get_children())
+        for index, row in enumerate(rows):
+            iid = new_iids[index]
+            values = self.format_row(row)
+            old = self._shown.get(iid)
+            if old is None:
+                tree.insert("", index, iid=iid, values=values)
+                current.insert(index, iid)
+            else:
+                if old != values:
+                    tree.item(iid, values=values)
+                if current[index] != iid:
+                    tree.move(iid, "", index)
+                    current.remove(iid)
+                    current.insert(index, iid)
+            self._shown[iid] = values
+            if row.id in self.selected:
+                # обновляем сохранённую строку свежими данными
+                self.selected[row.id] = row
+
+        window = [iid for iid, row in zip(new_iids, rows) if row.id in self.selected]
+        if set(window) != set(tree.selection()):
+            tree.selection_set(window)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if self.total <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / self.total,
+                               (self.top + self.visible) / self.total)